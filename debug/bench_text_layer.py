@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark OCR text layer stitching
+
+Adds the text layer from saved OCR results to blank pages, once with the
+batched path used by the processor and once inserting words one at a time,
+and reports words per second for each.
+
+Usage:
+    python debug/bench_text_layer.py <ocr_file> [<ocr_file> ...] [--repeat N]
+
+OCR files are the .ocr.gz (or legacy .ocr.json) files found in a notebook's
+rm_output directory.
+
+Requirements:
+    pip install pymupdf
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rm_viewer.ocr import load_ocr_result, add_text_layer_to_page
+
+
+def stitch(ocr_results, repeat, batched, debug=False):
+    """
+    Stitch every OCR result onto its own blank page, repeat times.
+
+    Returns:
+        tuple of (words added, seconds taken, size of the saved PDF in bytes)
+    """
+    words = 0
+    size = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        doc = fitz.open()
+        for result in ocr_results:
+            width, height = result['pdf_width_pt'], result['pdf_height_pt']
+            page = doc.new_page(width=width, height=height)
+            words += add_text_layer_to_page(
+                page, result, width, height, debug=debug, batched=batched
+            )
+        size = len(doc.tobytes())
+        doc.close()
+    return words, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare batched and per-word OCR text layer stitching'
+    )
+    parser.add_argument('ocr_files', nargs='+', help='Paths to OCR result files')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Times to stitch each page (default: 20)')
+    parser.add_argument('--debug', action='store_true',
+                        help='Also draw visible text and bounding boxes')
+
+    args = parser.parse_args()
+
+    ocr_results = [load_ocr_result(Path(f)) for f in args.ocr_files]
+    print(f"{len(ocr_results)} pages, "
+          f"{sum(len(r['words']) for r in ocr_results)} words, "
+          f"{args.repeat} repeats")
+
+    for label, batched in (('per-word', False), ('batched', True)):
+        words, seconds, size = stitch(ocr_results, args.repeat, batched, args.debug)
+        print(f"  {label:>8}: {words / seconds:,.0f} words/s "
+              f"({seconds:.2f}s, {size / 1024:.0f} KB per run)")
+
+
+if __name__ == "__main__":
+    main()
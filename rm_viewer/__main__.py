@@ -9,9 +9,10 @@ log = logging.getLogger(__package__)
 
 from .utils import setup_logger
 
-from .rm_process import build_process_parser, rm_process
+from .rm_process import build_process_parser, rm_process, build_ocr_worker_parser, ocr_worker
 from .rm_view import build_view_parser, rm_view
 from .syncd import build_syncd_parser, rm_syncd
+from .ocr import build_ocr_migrate_parser, ocr_migrate
 
 def parse_args() -> argparse.Namespace:
     """
@@ -29,6 +30,8 @@ def parse_args() -> argparse.Namespace:
     build_process_parser(subparser)
     build_view_parser(subparser)
     build_syncd_parser(subparser)
+    build_ocr_migrate_parser(subparser)
+    build_ocr_worker_parser(subparser)
     args = parser.parse_args()
     return args
 
@@ -44,3 +47,9 @@ if __name__ == "__main__":
 
     if args.action == 'syncd':
         rm_syncd(args)
+
+    if args.action == 'ocr-migrate':
+        ocr_migrate(args)
+
+    if args.action == 'ocr-worker':
+        ocr_worker(args)
@@ -1,145 +1,823 @@
+import os
 import json
+import gzip
+import time
 import base64
 import logging
+import argparse
 import math
+import threading
+import uuid
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+from dataclasses import dataclass, asdict, field
+from concurrent.futures import ThreadPoolExecutor
 
 import fitz
+import numpy as np
+import xxhash
 import requests
+from requests.adapters import HTTPAdapter
+
+from .utils import validate_path, restage_file, locked, write_json_atomic
 
 log = logging.getLogger(__name__)
 
+# OCR results are stored as gzipped JSON holding only what the text layer and
+# search index need: the full page text plus parallel word / bounding box arrays.
+# Version 1 is the legacy pretty-printed .ocr.json with the raw GCV response.
+OCR_FORMAT_VERSION = 2
+OCR_SUFFIX = '.ocr.gz'
+LEGACY_OCR_SUFFIX = '.ocr.json'
+
+# images:annotate endpoint; $GCV_ENDPOINT overrides it (e.g. for a local stand-in)
+GCV_ENDPOINT = 'https://vision.googleapis.com/v1/images:annotate'
+# GCV accepts at most 16 images per request, and caps the request body size
+GCV_BATCH_SIZE = 16
+GCV_MAX_REQUEST_BYTES = 8 * 1024 * 1024
+# Requests in flight at once, per process
+GCV_CONCURRENCY = 4
+# Attempts per request on 429/5xx or connection errors, with exponential backoff
+GCV_MAX_ATTEMPTS = 5
+GCV_BACKOFF_SECONDS = 1.0
+GCV_TIMEOUT = 60
+# Requests per minute, per process; GCV's default per-project quota. 0 for no limit
+GCV_REQUESTS_PER_MINUTE = 1800
+
+# Pages sent for OCR today and per run, so budgets hold across processes
+OCR_USAGE_FILE = 'ocr_usage.json'
+# Per-run page counts are dropped from the usage file once untouched this long
+OCR_RUN_USAGE_MAX_AGE = 7 * 24 * 60 * 60
+
+# Held by the processor for a whole run, and by the OCR worker and OCR
+# migration while they update metadata, so metadata.json only ever has one writer
+METADATA_LOCK_FILE = 'metadata.lock'
+
+# Shared OCR cache, under the processed output directory
+OCR_CACHE_DIR = 'ocr_cache'
+OCR_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Pages whose ink fits within this many points both ways (nothing, a stray dot
+# or an accidental tap) are treated as blank and never sent for OCR
+OCR_MIN_INK_EXTENT_PT = 10.0
+
+
+@dataclass(frozen=True)
+class OCRImageOptions:
+    """How pages are rasterised and encoded before being sent for OCR.
+
+    With crop_to_ink, only the padded bounding box of the page's strokes is
+    rendered. The DPI is then lowered from `dpi` (never below `min_dpi`) until
+    the image fits in `max_pixels`, so small notes keep full detail while
+    fully written pages don't produce huge uploads. Without crop_to_ink,
+    whole pages are always rendered at `dpi`.
+    """
+    dpi: int = 600
+    grayscale: bool = False
+    image_format: str = 'png'  # "png" or "jpeg"
+    jpeg_quality: int = 90
+    crop_to_ink: bool = True
+    ink_padding_pt: float = 18.0
+    min_dpi: int = 200
+    max_pixels: int = 16_000_000  # 0 for no limit
+
+
+@dataclass(frozen=True)
+class OCRBudget:
+    """Limits on how much is sent to GCV.
+
+    Page counts are kept in usage_path (with a lock file beside it), so the
+    limits hold across pool workers and, for the per-day count, across runs.
+    Each run_id has its own per-run count, so budgets with different run_ids
+    (e.g. a processor run and an OCR worker) can be in use at the same time.
+    Copies of a budget share run_id and so share the per-run count.
+    Pages that were reserved but got no result are handed back with
+    release(). Limits of 0 mean no limit.
+    """
+    usage_path: Path
+    max_pages_per_run: int = 0
+    max_pages_per_day: int = 0
+    requests_per_minute: float = GCV_REQUESTS_PER_MINUTE
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def reserve(self, pages: int) -> int:
+        """
+        Claim up to `pages` pages from the budget.
+
+        :param pages: Number of pages about to be sent for OCR
+        :returns: How many of them may be sent now
+        """
+        if not self.max_pages_per_run and not self.max_pages_per_day:
+            return pages
+
+        with locked(self.usage_path.with_name(f'{self.usage_path.name}.lock')):
+            day_pages, runs = self._read_usage()
+            run_pages = runs.get(self.run_id, {}).get('pages', 0)
+
+            allowed = pages
+            if self.max_pages_per_run:
+                allowed = min(allowed, max(self.max_pages_per_run - run_pages, 0))
+            if self.max_pages_per_day:
+                allowed = min(allowed, max(self.max_pages_per_day - day_pages, 0))
+
+            self._write_usage(day_pages + allowed, runs, run_pages + allowed)
+        return allowed
+
+    def release(self, pages: int):
+        """
+        Hand back pages claimed by reserve() that weren't OCR'd (e.g. GCV
+        failed), so they don't count against the budget when retried.
+
+        :param pages: Number of reserved pages that got no result
+        """
+        if not pages or (not self.max_pages_per_run and not self.max_pages_per_day):
+            return
+
+        with locked(self.usage_path.with_name(f'{self.usage_path.name}.lock')):
+            day_pages, runs = self._read_usage()
+            run_pages = runs.get(self.run_id, {}).get('pages', 0)
+            self._write_usage(max(day_pages - pages, 0), runs, max(run_pages - pages, 0))
+
+    def _read_usage(self) -> tuple[int, dict]:
+        """Read today's page count and the recent runs, with the lock held."""
+        usage = {}
+        if self.usage_path.exists():
+            try:
+                with open(self.usage_path) as f:
+                    usage = json.load(f)
+            except ValueError:
+                log.warning(f"Ignoring unreadable OCR usage file {self.usage_path}")
+
+        now = time.time()
+        today = datetime.now().date().isoformat()
+        day_pages = usage.get('day_pages', 0) if usage.get('date') == today else 0
+        runs = {
+            run_id: run for run_id, run in usage.get('runs', {}).items()
+            if now - run.get('updated', 0) < OCR_RUN_USAGE_MAX_AGE
+        }
+        return day_pages, runs
+
+    def _write_usage(self, day_pages: int, runs: dict, run_pages: int):
+        """Write usage back with this run's page count, with the lock held."""
+        runs[self.run_id] = {'pages': run_pages, 'updated': time.time()}
+        write_json_atomic(self.usage_path, {
+            'date': datetime.now().date().isoformat(),
+            'day_pages': day_pages,
+            'runs': runs
+        })
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` acquisitions per second,
+    with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class GCVClient:
+    """
+    Google Cloud Vision TEXT_DETECTION client.
+
+    Packs several images into each images:annotate request, keeps up to
+    `concurrency` requests in flight over a pooled session, and retries with
+    backoff on rate limiting and server errors. A batch rejected with a
+    client error is resent one image at a time, so only the bad images fail.
+    Requests (including retries) are paced by a token bucket to
+    `requests_per_minute`.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    AUTH_STATUSES = {401, 403}
+
+    def __init__(
+        self,
+        api_key: str,
+        endpoint: str | None = None,
+        batch_size: int = GCV_BATCH_SIZE,
+        concurrency: int = GCV_CONCURRENCY,
+        max_attempts: int = GCV_MAX_ATTEMPTS,
+        timeout: float = GCV_TIMEOUT,
+        requests_per_minute: float = GCV_REQUESTS_PER_MINUTE
+    ):
+        self.api_key = api_key
+        self.endpoint = endpoint or os.environ.get('GCV_ENDPOINT', GCV_ENDPOINT)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.requests_per_minute = requests_per_minute
+
+        # Allow up to a second's worth of requests in a burst
+        self.rate_limiter = None
+        if requests_per_minute > 0:
+            rate = requests_per_minute / 60
+            self.rate_limiter = TokenBucket(rate, max(rate, 1))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        self.retries = 0
+
+    def _batches(self, images: list[bytes]) -> list[list[int]]:
+        """Split image indices into batches within the count and size limits."""
+        batches = []
+        batch = []
+        batch_bytes = 0
+        for i, image in enumerate(images):
+            # Base64 inflates the payload by 4/3
+            image_bytes = len(image) * 4 // 3
+            if batch and (len(batch) >= self.batch_size
+                          or batch_bytes + image_bytes > GCV_MAX_REQUEST_BYTES):
+                batches.append(batch)
+                batch = []
+                batch_bytes = 0
+            batch.append(i)
+            batch_bytes += image_bytes
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _post(self, request_body: dict) -> dict | None:
+        """
+        POST one annotate request, retrying transient failures.
+
+        :returns: Response JSON, or None if it still failed after retrying
+        :raises requests.HTTPError: If the request was rejected (4xx)
+        """
+        delay = GCV_BACKOFF_SECONDS
+        for attempt in range(1, self.max_attempts + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            with self._lock:
+                self.requests_sent += 1
+            try:
+                # Key goes in a header so it never shows up in logged URLs
+                response = self.session.post(
+                    self.endpoint,
+                    headers={'X-Goog-Api-Key': self.api_key},
+                    json=request_body,
+                    timeout=self.timeout
+                )
+                if response.status_code not in self.RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                error = f'HTTP {response.status_code}'
+                retry_after = response.headers.get('Retry-After', '')
+                wait = float(retry_after) if retry_after.isdigit() else delay
+            except requests.HTTPError:
+                raise
+            except requests.RequestException as e:
+                error = str(e)
+                wait = delay
+
+            if attempt == self.max_attempts:
+                log.warning(f"GCV API call failed after {attempt} attempts: {error}")
+                return None
+            log.info(f"GCV API call failed ({error}), retrying in {wait:.1f}s")
+            with self._lock:
+                self.retries += 1
+            time.sleep(wait)
+            delay *= 2
+        return None
+
+    def _annotate_batch(self, images: list[bytes]) -> list[dict | None]:
+        request_body = {
+            "requests": [{
+                "image": {"content": base64.b64encode(image).decode('utf-8')},
+                "features": {"type": "TEXT_DETECTION"},
+                "imageContext": {"languageHints": ["en"]}
+            } for image in images]
+        }
+        try:
+            result = self._post(request_body)
+        except requests.HTTPError as e:
+            # Bad keys fail every image alike; otherwise one bad image (e.g.
+            # too large) shouldn't fail the rest of its batch
+            if len(images) == 1 or e.response.status_code in self.AUTH_STATUSES:
+                log.warning(f"GCV API call failed: {e}")
+                return [None] * len(images)
+            log.warning(f"GCV API rejected a batch of {len(images)} images ({e}), sending them one at a time")
+            return [self._annotate_batch([image])[0] for image in images]
+        if result is None:
+            return [None] * len(images)
+
+        responses = result.get('responses', [])
+        annotated = []
+        for i in range(len(images)):
+            response = responses[i] if i < len(responses) else None
+            if response is None or 'error' in response:
+                error = response.get('error', {}).get('message') if response else 'missing'
+                log.warning(f"GCV API returned an error for image: {error}")
+                annotated.append(None)
+            else:
+                # Same shape as a single-image response
+                annotated.append({'responses': [response]})
+        return annotated
+
+    def annotate(self, images: list[bytes]) -> list[dict | None]:
+        """
+        Run TEXT_DETECTION on a list of encoded images.
+
+        :param images: PNG/JPEG image bytes
+        :returns: For each image in order, a GCV response dict shaped like a
+                  single-image request ({'responses': [...]}), or None on failure
+        """
+        batches = self._batches(images)
+        results: list[dict | None] = [None] * len(images)
+
+        def run_batch(batch: list[int]):
+            return batch, self._annotate_batch([images[i] for i in batch])
+
+        workers = min(self.concurrency, len(batches))
+        if workers <= 1:
+            done = map(run_batch, batches)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            done = executor.map(run_batch, batches)
+        try:
+            for batch, annotated in done:
+                for i, response in zip(batch, annotated):
+                    results[i] = response
+        finally:
+            if workers > 1:
+                executor.shutdown()
+        return results
+
+    def close(self):
+        self.session.close()
+
+
+_client: GCVClient | None = None
+_client_pid: int | None = None
+_client_lock = threading.Lock()
+
 
-def call_gcv_api(image_path: Path, api_key: str) -> dict | None:
+def get_gcv_client(api_key: str, requests_per_minute: float = GCV_REQUESTS_PER_MINUTE) -> GCVClient:
     """
-    Call Google Cloud Vision TEXT_DETECTION API on an image.
+    Get this process's shared GCV client, creating it on first use so that
+    connections are reused across items.
 
-    :param image_path: Path to the image file
     :param api_key: Google Cloud Vision API key
-    :returns: Raw GCV API response dict, or None on failure
-    """
-    # Read and base64 encode the image
-    with open(image_path, 'rb') as f:
-        image_data = base64.b64encode(f.read()).decode('utf-8')
-
-    # Build the API request
-    request_body = {
-        "requests": [{
-            "image": {"content": image_data},
-            "features": {"type": "TEXT_DETECTION"},
-            "imageContext": {"languageHints": ["en"]}
-        }]
-    }
+    :param requests_per_minute: Request rate limit for this process, 0 for none
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if (_client is None or _client_pid != os.getpid() or _client.api_key != api_key
+                or _client.requests_per_minute != requests_per_minute):
+            # A client inherited over fork shares the parent's sockets; start our own
+            _client = GCVClient(api_key, requests_per_minute=requests_per_minute)
+            _client_pid = os.getpid()
+        return _client
 
-    url = f"https://vision.googleapis.com/v1/images:annotate?key={api_key}"
 
-    try:
-        response = requests.post(
-            url,
-            json=request_body,
-            headers={"Content-Type": "application/json"},
-            timeout=60
+class OCRCache:
+    """
+    Content-addressed OCR results shared by every notebook in an output directory.
+
+    Entries are keyed by what determines the result: the page's rm_hash, its
+    render dimensions and the OCR image options. So duplicated notebooks,
+    pages copied between notebooks and re-created output directories never
+    pay for OCR twice. Notebooks get their own (hardlinked) copy of an entry,
+    so evicting it never breaks them. Once the cache grows past max_bytes,
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = OCR_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(rm_hash: str, render_dims: list[float] | None, options: OCRImageOptions) -> str:
+        """
+        :param rm_hash: xxh3 hash of the source .rm file
+        :param render_dims: Page size the .rm was rendered at (None for the device default)
+        :param options: OCR image options the result was produced with
+        """
+        material = json.dumps(
+            [OCR_FORMAT_VERSION, rm_hash, render_dims, asdict(options)], sort_keys=True
         )
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        log.warning(f"GCV API call failed: {e}")
+        return xxhash.xxh3_128_hexdigest(material.encode())
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}{OCR_SUFFIX}'
+
+    def get(self, key: str, dest: Path) -> bool:
+        """
+        Place the cached result for key at dest.
+
+        :returns: True on a cache hit, False if there is no entry
+        """
+        path = self._path(key)
+        try:
+            restage_file(path, dest)
+        except FileNotFoundError:
+            return False
+        # Mark as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True
+
+    def put(self, key: str, src: Path):
+        """Add a freshly saved OCR result to the cache."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            restage_file(src, self._path(key))
+        except OSError as e:
+            log.warning(f"Failed to add {src.name} to OCR cache: {e}")
+
+    def evict(self) -> dict:
+        """
+        Evict least recently used entries until the cache fits in max_bytes.
+
+        :returns: Stats dict with entries, bytes and evicted (after eviction)
+        """
+        entries = []
+        if self.cache_dir.exists():
+            for f in self.cache_dir.glob(f'*{OCR_SUFFIX}'):
+                try:
+                    st = f.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, f))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, f in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            f.unlink(missing_ok=True)
+            total_bytes -= size
+            evicted += 1
+
+        if evicted:
+            log.info(f"Evicted {evicted} entries from OCR cache")
+        return {
+            'entries': len(entries) - evicted,
+            'bytes': total_bytes,
+            'evicted': evicted
+        }
+
+
+def get_ink_bbox(page: fitz.Page) -> fitz.Rect | None:
+    """
+    Get the bounding box of the strokes drawn on a page.
+
+    Works from the page's vector drawings, ignoring unstroked white fills
+    (page backgrounds and eraser masks).
+
+    :param page: PyMuPDF page, e.g. a converted .rm page
+    :returns: Ink bounding box in page points, or None if nothing is drawn
+    """
+    x0 = y0 = float('inf')
+    x1 = y1 = float('-inf')
+    for path in page.get_drawings():
+        fill = path.get('fill')
+        if path.get('color') is None and fill is not None and min(fill) >= 0.99:
+            continue
+        rect = path['rect']
+        # Path rects exclude the stroke width
+        half_width = (path.get('width') or 0) / 2
+        x0 = min(x0, rect.x0 - half_width)
+        y0 = min(y0, rect.y0 - half_width)
+        x1 = max(x1, rect.x1 + half_width)
+        y1 = max(y1, rect.y1 + half_width)
+
+    if x0 > x1 or y0 > y1:
         return None
+    return fitz.Rect(x0, y0, x1, y1) & page.rect
 
 
-def pdf_to_image(pdf_path: Path, output_path: Path, dpi: int = 300) -> tuple[int, int]:
+def is_blank_page(pdf_path: Path, min_extent_pt: float = OCR_MIN_INK_EXTENT_PT) -> bool:
     """
-    Convert a PDF page to a PNG image.
+    Cheap check for pages with nothing worth sending for OCR.
+
+    :param pdf_path: Path to a converted .rm PDF
+    :param min_extent_pt: Ink smaller than this in both directions counts as blank
+    :returns: True if the page has no ink, or only a speck of it
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        ink_bbox = get_ink_bbox(doc[0])
+    finally:
+        doc.close()
+    return ink_bbox is None or (
+        ink_bbox.width < min_extent_pt and ink_bbox.height < min_extent_pt
+    )
+
+
+def render_ocr_image(pdf_path: Path, options: OCRImageOptions) -> tuple[bytes, dict]:
+    """
+    Render the first page of a PDF straight to encoded image bytes.
 
     :param pdf_path: Path to the PDF file
-    :param output_path: Path for the output PNG image
-    :param dpi: Resolution for the output image (default 300)
-    :returns: (width_px, height_px) of the generated image
+    :param options: Rasterisation and encoding options
+    :returns: Tuple of (encoded image bytes, dict of pdf_width_pt, pdf_height_pt,
+              img_width_px, img_height_px, dpi and crop). crop is the page
+              region covered by the image, as [x0, y0, x1, y1] in points
     """
     doc = fitz.open(pdf_path)
-    page = doc[0]  # Get first page
+    try:
+        page = doc[0]
 
-    # Calculate zoom factor for desired DPI (PDF default is 72 DPI)
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
+        clip = page.rect
+        if options.crop_to_ink:
+            ink_bbox = get_ink_bbox(page)
+            if ink_bbox is not None and not ink_bbox.is_empty:
+                pad = options.ink_padding_pt
+                clip = (ink_bbox + (-pad, -pad, pad, pad)) & page.rect
 
-    pix = page.get_pixmap(matrix=mat, colorspace=fitz.csRGB)
-    pix.save(output_path)
+        # For crops, pick the highest DPI (up to options.dpi) that fits the pixel budget
+        dpi = options.dpi
+        if options.crop_to_ink and options.max_pixels:
+            area_in2 = (clip.width / 72) * (clip.height / 72)
+            dpi = min(dpi, (options.max_pixels / area_in2) ** 0.5)
+        dpi = max(dpi, options.min_dpi)
 
-    width_px, height_px = pix.width, pix.height
+        # Calculate zoom factor for desired DPI (PDF default is 72 DPI)
+        zoom = dpi / 72
+        colorspace = fitz.csGRAY if options.grayscale else fitz.csRGB
+        pix = page.get_pixmap(
+            matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=False,
+            clip=None if clip == page.rect else clip
+        )
 
-    pix = None  # Free memory
-    doc.close()
+        if options.image_format == 'jpeg':
+            image = pix.tobytes('jpg', jpg_quality=options.jpeg_quality)
+        else:
+            image = pix.tobytes('png')
 
-    return width_px, height_px
+        dims = {
+            'pdf_width_pt': page.rect.width,
+            'pdf_height_pt': page.rect.height,
+            'img_width_px': pix.width,
+            'img_height_px': pix.height,
+            'dpi': dpi,
+            # The pixmap covers whole pixels, so report its exact extent
+            'crop': [
+                pix.x / zoom, pix.y / zoom,
+                (pix.x + pix.width) / zoom, (pix.y + pix.height) / zoom
+            ],
+        }
+        pix = None  # Free the raw samples before the next page is rendered
+        return image, dims
+    finally:
+        doc.close()
 
 
-def run_ocr_on_rm_output(
-    rm_output_pdf: Path,
-    ocr_json_path: Path,
+def run_ocr_on_rm_outputs(
+    jobs: list[tuple[Path, Path, str]],
     api_key: str,
-    rm_hash: str,
-    dpi: int = 300
-) -> dict | None:
+    options: OCRImageOptions | None = None,
+    requests_per_minute: float = GCV_REQUESTS_PER_MINUTE
+) -> list[dict | None]:
     """
-    Run OCR on an rm output PDF and save results as JSON.
+    Run OCR on several rm output PDFs and save the compact results.
 
-    Creates a temporary PNG, runs OCR, deletes the PNG, and saves results.
-    The rm_hash is stored in the output for future caching support.
+    Pages are rendered in memory and sent to GCV a chunk at a time, so only
+    one chunk of encoded images is held at once.
 
-    :param rm_output_pdf: Path to the converted .rm PDF
-    :param ocr_json_path: Path to save the OCR JSON result
+    :param jobs: List of (rm output PDF, path to save the OCR result, xxh3
+                 hash of the source .rm file)
     :param api_key: Google Cloud Vision API key
-    :param rm_hash: MD5 hash of the source .rm file
-    :param dpi: DPI for image conversion (default 300)
-    :returns: OCR result dict, or None on failure
+    :param options: Rasterisation and encoding options (defaults to OCRImageOptions())
+    :param requests_per_minute: GCV request rate limit for this process, 0 for none
+    :returns: OCR result dict for each job in order, or None on failure
     """
-    # Get PDF dimensions
-    doc = fitz.open(rm_output_pdf)
-    page = doc[0]
-    pdf_width_pt = page.rect.width
-    pdf_height_pt = page.rect.height
-    doc.close()
+    options = options or OCRImageOptions()
+    client = get_gcv_client(api_key, requests_per_minute)
+    chunk_size = client.batch_size * client.concurrency
+    results = []
 
-    # Create temp image path (same location as output, with .png extension)
-    temp_image_path = ocr_json_path.with_suffix('.png')
+    for start in range(0, len(jobs), chunk_size):
+        chunk = jobs[start:start + chunk_size]
+        images = []
+        page_dims = []
+        for rm_output_pdf, _, _ in chunk:
+            try:
+                image, dims = render_ocr_image(rm_output_pdf, options)
+            except Exception as e:
+                log.warning(f"Could not render {rm_output_pdf} for OCR: {e}")
+                image, dims = None, None
+            images.append(image)
+            page_dims.append(dims)
 
-    try:
-        # Convert PDF to image
-        img_width_px, img_height_px = pdf_to_image(rm_output_pdf, temp_image_path, dpi)
-
-        # Call GCV API
-        log.info(f"Sending OCR request for: {rm_output_pdf}")
-        gcv_response = call_gcv_api(temp_image_path, api_key)
-
-        if gcv_response is None:
-            log.warning(f"OCR failed for {rm_output_pdf}")
-            return None
-
-        # Build the OCR result with metadata
-        ocr_result = {
-            "rm_hash": rm_hash,
-            "pdf_width_pt": pdf_width_pt,
-            "pdf_height_pt": pdf_height_pt,
-            "img_width_px": img_width_px,
-            "img_height_px": img_height_px,
-            "dpi": dpi,
-            "timestamp": datetime.now().isoformat(),
-            "gcv_response": gcv_response
-        }
+        # Pages that failed to render aren't sent
+        sent = [i for i, image in enumerate(images) if image is not None]
+        log.info(f"Sending OCR requests for {len(sent)} pages")
+        responses = [None] * len(chunk)
+        for i, response in zip(sent, client.annotate([images[i] for i in sent])):
+            responses[i] = response
+        images = None
 
-        # Save to JSON
-        with open(ocr_json_path, 'w') as f:
-            json.dump(ocr_result, f, indent=2)
+        for (rm_output_pdf, ocr_path, rm_hash), dims, gcv_response in zip(chunk, page_dims, responses):
+            if gcv_response is None:
+                log.warning(f"OCR failed for {rm_output_pdf}")
+                results.append(None)
+                continue
 
-        log.info(f"OCR completed for {rm_output_pdf.name}")
-        return ocr_result
+            # Build the OCR result with metadata
+            ocr_result = compact_ocr_result({
+                "rm_hash": rm_hash,
+                **dims,
+                "timestamp": datetime.now().isoformat(),
+                "gcv_response": gcv_response
+            })
 
-    finally:
-        # Always clean up temp image
-        if temp_image_path.exists():
-            temp_image_path.unlink()
+            save_ocr_result(ocr_result, ocr_path)
+            log.info(f"OCR completed for {rm_output_pdf.name}")
+            results.append(ocr_result)
+
+    return results
+
+
+def compact_ocr_result(ocr_result: dict) -> dict:
+    """
+    Convert an OCR result holding the raw GCV response into the compact format.
+
+    Only words with a full bounding box and non-blank text are kept, as those
+    are the only ones add_text_layer_to_page() can place.
+
+    :param ocr_result: OCR result dict with gcv_response and dimensions
+    :returns: Compact OCR result dict
+    """
+    gcv_response = ocr_result.get('gcv_response', {})
+    responses = gcv_response.get('responses', [{}])
+    text_annotations = responses[0].get('textAnnotations', [])
+
+    full_text = text_annotations[0].get('description', '') if text_annotations else ''
+    words = []
+    boxes = []
+    for word_data in text_annotations[1:]:
+        text = word_data.get('description', '')
+        vertices = word_data.get('boundingPoly', {}).get('vertices', [])
+        if len(vertices) < 4 or not text.strip():
+            continue
+        words.append(text)
+        for v in vertices[:4]:
+            boxes.extend((v.get('x', 0), v.get('y', 0)))
+
+    return {
+        'version': OCR_FORMAT_VERSION,
+        'rm_hash': ocr_result.get('rm_hash', ''),
+        'pdf_width_pt': ocr_result['pdf_width_pt'],
+        'pdf_height_pt': ocr_result['pdf_height_pt'],
+        'img_width_px': ocr_result['img_width_px'],
+        'img_height_px': ocr_result['img_height_px'],
+        'dpi': ocr_result.get('dpi'),
+        # Page region the image covers, in points; absent means the whole page
+        'crop': ocr_result.get('crop'),
+        'timestamp': ocr_result.get('timestamp'),
+        'full_text': full_text,
+        'words': words,
+        # Flat x0, y0, ... x3, y3 per word, in GCV vertex order
+        'boxes': boxes,
+    }
+
+
+def save_ocr_result(ocr_result: dict, ocr_path: Path):
+    """
+    Save a compact OCR result as gzipped JSON.
+
+    :param ocr_result: Compact OCR result dict
+    :param ocr_path: Path to write (should end in OCR_SUFFIX)
+    """
+    tmp_path = ocr_path.with_name(ocr_path.name + '.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(ocr_result, f, separators=(',', ':'))
+    tmp_path.replace(ocr_path)
+
+
+def load_ocr_result(ocr_path: Path) -> dict:
+    """
+    Load a saved OCR result, converting legacy .ocr.json files on the fly.
+
+    :param ocr_path: Path to the OCR result file
+    :returns: Compact OCR result dict
+    """
+    if ocr_path.name.endswith(LEGACY_OCR_SUFFIX):
+        with open(ocr_path) as f:
+            return compact_ocr_result(json.load(f))
+    with gzip.open(ocr_path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_ocr_full_text(ocr_result: dict) -> str:
+    """
+    Get the full recognised text of a page from an OCR result.
+
+    :param ocr_result: Compact OCR result dict
+    :returns: Full page text, or an empty string if nothing was recognised
+    """
+    return ocr_result.get('full_text', '').strip()
+
+
+def iter_ocr_words(ocr_result: dict):
+    """
+    Iterate over the words of a compact OCR result.
+
+    :param ocr_result: Compact OCR result dict
+    :returns: Iterator of (text, vertices) with vertices as 4 {'x', 'y'} dicts
+    """
+    boxes = ocr_result.get('boxes', [])
+    for i, text in enumerate(ocr_result.get('words', [])):
+        box = boxes[i * 8:i * 8 + 8]
+        vertices = [{'x': box[j], 'y': box[j + 1]} for j in range(0, 8, 2)]
+        yield text, vertices
+
+
+def migrate_ocr_results(output_dir: Path) -> tuple[int, int]:
+    """
+    Rewrite legacy .ocr.json files referenced by metadata.json in the compact
+    format, updating their ocr_path entries. Holds the metadata lock
+    throughout, so waits for any running processor or OCR worker.
+
+    :param output_dir: Processed output directory (the one containing metadata.json)
+    :returns: Tuple of (files migrated, files that failed to migrate)
+    """
+    with locked(output_dir / METADATA_LOCK_FILE):
+        return _migrate_ocr_results(output_dir)
+
+
+def _migrate_ocr_results(output_dir: Path) -> tuple[int, int]:
+    """migrate_ocr_results() with the metadata lock held."""
+    metadata_path = output_dir / 'metadata.json'
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+
+    migrated = []
+    failed = 0
+    for item in metadata:
+        for rm_file in item.get('rm_files', []):
+            ocr_rel_path = rm_file.get('ocr_path')
+            if not ocr_rel_path or not ocr_rel_path.endswith(LEGACY_OCR_SUFFIX):
+                continue
+
+            legacy_path = output_dir / ocr_rel_path
+            new_path = legacy_path.with_name(
+                legacy_path.name[:-len(LEGACY_OCR_SUFFIX)] + OCR_SUFFIX
+            )
+            try:
+                save_ocr_result(load_ocr_result(legacy_path), new_path)
+            except Exception as e:
+                log.warning(f"Failed to migrate {legacy_path}: {e}")
+                failed += 1
+                continue
+
+            rm_file['ocr_path'] = str(new_path.relative_to(output_dir))
+            migrated.append(legacy_path)
+
+    if migrated:
+        write_json_atomic(metadata_path, metadata, indent=2)
+
+        # Only drop the legacy files once metadata points at their replacements
+        for legacy_path in migrated:
+            legacy_path.unlink()
+
+    return len(migrated), failed
+
+
+def build_ocr_migrate_parser(parser: argparse._SubParsersAction):
+    migrate_parser = parser.add_parser(
+        'ocr-migrate',
+        help='Convert OCR results in an output directory from the legacy '
+            '.ocr.json format to the compact format.'
+    )
+    migrate_parser.add_argument(
+        'output_dir', type=validate_path,
+        help="Path to processed output dir (the one containing metadata.json)"
+    )
+
+
+def ocr_migrate(args: argparse.Namespace):
+    migrated, failed = migrate_ocr_results(Path(args.output_dir))
+    print(f"{migrated} OCR results migrated")
+    if failed:
+        print(f"{failed} OCR results failed to migrate (see log)")
 
 
 def get_text_geometry(vertices: list[dict]) -> dict | None:
@@ -193,24 +871,56 @@ def get_text_geometry(vertices: list[dict]) -> dict | None:
     }
 
 
-def add_text_layer_to_page(
-    page: fitz.Page,
+def get_text_geometry_batch(boxes: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Vectorised get_text_geometry() over many words at once.
+
+    :param boxes: (n, 4, 2) array of vertex x, y coordinates in GCV order
+    :returns: dict of (n,) arrays angle, box_width, box_height, baseline_x,
+              baseline_y, matching get_text_geometry() per word
+    """
+    v0, v1, v3 = boxes[:, 0], boxes[:, 1], boxes[:, 3]
+
+    # Vectors along the text direction (v0 to v1) and its height (v0 to v3)
+    text_dir = v1 - v0
+    perp_dir = v3 - v0
+
+    # Negated for PDF coordinates, as in get_text_geometry()
+    image_angle = np.degrees(np.arctan2(text_dir[:, 1], text_dir[:, 0]))
+
+    baseline_ratio = 0.75
+    baseline = v0 + perp_dir * baseline_ratio
+
+    return {
+        'angle': -image_angle,
+        'box_width': np.hypot(text_dir[:, 0], text_dir[:, 1]),
+        'box_height': np.hypot(perp_dir[:, 0], perp_dir[:, 1]),
+        'baseline_x': baseline[:, 0],
+        'baseline_y': baseline[:, 1],
+    }
+
+
+@lru_cache(maxsize=None)
+def get_text_layer_font() -> fitz.Font:
+    """The Helvetica font used to measure text layer words, created once per process."""
+    return fitz.Font("helv")
+
+
+def get_text_layer_transform(
     ocr_result: dict,
     target_width_pt: float,
-    target_height_pt: float,
-    debug: bool = False
-) -> int:
+    target_height_pt: float
+) -> tuple[float, float, float, float]:
     """
-    Add invisible text layer to a PDF page from OCR results.
+    Work out the mapping from OCR image pixels to target page points.
 
-    Handles coordinate transformation from image pixels to PDF points.
+    Handles images that only covered a cropped region of the page.
 
-    :param page: PyMuPDF page object to add text to
-    :param ocr_result: OCR result dict with gcv_response and dimensions
+    :param ocr_result: Compact OCR result dict
     :param target_width_pt: Width of the target page in points
     :param target_height_pt: Height of the target page in points
-    :param debug: If True, make text visible for debugging
-    :returns: Number of words added
+    :returns: Tuple of (scale_x, scale_y, offset_x, offset_y), so that
+              page_x = offset_x + image_x * scale_x
     """
     # Extract dimensions from OCR result
     img_width_px = ocr_result['img_width_px']
@@ -218,55 +928,153 @@ def add_text_layer_to_page(
     pdf_width_pt = ocr_result['pdf_width_pt']
     pdf_height_pt = ocr_result['pdf_height_pt']
 
+    # Page region covered by the image (the whole page unless it was cropped)
+    crop_x0, crop_y0, crop_x1, crop_y1 = (
+        ocr_result.get('crop') or [0, 0, pdf_width_pt, pdf_height_pt]
+    )
+
     # Calculate scale factors
     # First: image pixels to source PDF points
-    scale_x = pdf_width_pt / img_width_px
-    scale_y = pdf_height_pt / img_height_px
+    scale_x = (crop_x1 - crop_x0) / img_width_px
+    scale_y = (crop_y1 - crop_y0) / img_height_px
 
     # Second: source PDF points to target page points
     final_scale_x = target_width_pt / pdf_width_pt
     final_scale_y = target_height_pt / pdf_height_pt
 
-    # Combined scale
-    total_scale_x = scale_x * final_scale_x
-    total_scale_y = scale_y * final_scale_y
+    # Combined scale, plus the crop origin in target page points
+    return (
+        scale_x * final_scale_x,
+        scale_y * final_scale_y,
+        crop_x0 * final_scale_x,
+        crop_y0 * final_scale_y,
+    )
 
-    # Get word-level annotations from GCV response
-    gcv_response = ocr_result.get('gcv_response', {})
-    responses = gcv_response.get('responses', [{}])
-    text_annotations = responses[0].get('textAnnotations', [])
-    words = text_annotations[1:] if len(text_annotations) > 1 else []
 
-    font = fitz.Font("helv")
-    words_added = 0
+def layout_text_layer_words(
+    ocr_result: dict,
+    target_width_pt: float,
+    target_height_pt: float
+) -> dict[str, np.ndarray]:
+    """
+    Place every word of a page's text layer in one vectorised pass.
 
-    for word_data in words:
-        text = word_data.get('description', '')
-        vertices = word_data.get('boundingPoly', {}).get('vertices', [])
+    :param ocr_result: Compact OCR result dict
+    :param target_width_pt: Width of the target page in points
+    :param target_height_pt: Height of the target page in points
+    :returns: dict of per-word arrays in target page points: insert_x,
+              insert_y, angle, box_width, fontsize, and (n, 4, 2) vertices
+    """
+    scale_x, scale_y, offset_x, offset_y = get_text_layer_transform(
+        ocr_result, target_width_pt, target_height_pt
+    )
+    n_words = min(len(ocr_result.get('words', [])), len(ocr_result.get('boxes', [])) // 8)
+    boxes = np.asarray(ocr_result.get('boxes', [])[:n_words * 8], dtype=np.float64)
+    boxes = boxes.reshape(n_words, 4, 2)
 
-        if len(vertices) < 4 or not text.strip():
-            continue
+    geometry = get_text_geometry_batch(boxes)
+    scale = np.array([scale_x, scale_y])
+    offset = np.array([offset_x, offset_y])
+
+    box_height = geometry['box_height'] * scale_y
+    return {
+        'insert_x': offset_x + geometry['baseline_x'] * scale_x,
+        'insert_y': offset_y + geometry['baseline_y'] * scale_y,
+        'angle': geometry['angle'],
+        'box_width': geometry['box_width'] * scale_x,
+        # Height-based font sizing
+        'fontsize': np.maximum(box_height * 0.75, 6),
+        'vertices': offset + boxes * scale,
+    }
+
+
+def _iter_text_layer_words(
+    ocr_result: dict,
+    target_width_pt: float,
+    target_height_pt: float,
+    batched: bool
+):
+    """
+    Iterate over text layer word placements in target page points.
+
+    :param batched: Compute placements with layout_text_layer_words(), rather
+                    than with get_text_geometry() one word at a time
+    :returns: Iterator of (text, insert_x, insert_y, angle, box_width,
+              fontsize, vertices as (x, y) tuples)
+    """
+    if batched:
+        layout = layout_text_layer_words(ocr_result, target_width_pt, target_height_pt)
+        yield from zip(
+            ocr_result.get('words', []),
+            layout['insert_x'].tolist(),
+            layout['insert_y'].tolist(),
+            layout['angle'].tolist(),
+            layout['box_width'].tolist(),
+            layout['fontsize'].tolist(),
+            (list(map(tuple, v)) for v in layout['vertices'].tolist()),
+        )
+        return
 
+    total_scale_x, total_scale_y, offset_x, offset_y = get_text_layer_transform(
+        ocr_result, target_width_pt, target_height_pt
+    )
+    for text, vertices in iter_ocr_words(ocr_result):
         # Get text geometry in image pixel coordinates
         geometry = get_text_geometry(vertices)
         if geometry is None:
             continue
 
-        pdf_angle = geometry['angle']
         insert_x_px, insert_y_px = geometry['baseline_point']
 
-        # Transform coordinates to target page points
-        insert_x = insert_x_px * total_scale_x
-        insert_y = insert_y_px * total_scale_y
-
-        # Scale box dimensions to target page points
-        box_width = geometry['box_width'] * total_scale_x
-        box_height = geometry['box_height'] * total_scale_y
-
         # Height-based font sizing
-        fontsize = box_height * 0.75
+        fontsize = geometry['box_height'] * total_scale_y * 0.75
         fontsize = max(fontsize, 6)
 
+        yield (
+            text,
+            offset_x + insert_x_px * total_scale_x,
+            offset_y + insert_y_px * total_scale_y,
+            geometry['angle'],
+            geometry['box_width'] * total_scale_x,
+            fontsize,
+            [(offset_x + v.get('x', 0) * total_scale_x,
+              offset_y + v.get('y', 0) * total_scale_y)
+             for v in vertices],
+        )
+
+
+def add_text_layer_to_page(
+    page: fitz.Page,
+    ocr_result: dict,
+    target_width_pt: float,
+    target_height_pt: float,
+    debug: bool = False,
+    batched: bool = True
+) -> int:
+    """
+    Add invisible text layer to a PDF page from OCR results.
+
+    Word placements for the whole page are computed in one vectorised pass
+    and the words are written through a single Shape, committed to the page
+    in one content stream. batched=False places and inserts each word
+    separately, as earlier versions did; it's kept for benchmarking.
+
+    :param page: PyMuPDF page object to add text to
+    :param ocr_result: Compact OCR result dict
+    :param target_width_pt: Width of the target page in points
+    :param target_height_pt: Height of the target page in points
+    :param debug: If True, make text visible for debugging
+    :param batched: If False, place and insert words one at a time
+    :returns: Number of words added
+    """
+    font = get_text_layer_font()
+    render_mode = 0 if debug else 3  # 0 = visible, 3 = invisible
+    text_color = (0, 0, 1) if debug else None  # Blue for debug
+    shape = page.new_shape() if batched else None
+    words_added = 0
+
+    words = _iter_text_layer_words(ocr_result, target_width_pt, target_height_pt, batched)
+    for text, insert_x, insert_y, pdf_angle, box_width, fontsize, points in words:
         # Calculate horizontal scale to fit box width exactly
         natural_width = font.text_length(text, fontsize=fontsize)
         if natural_width > 0:
@@ -276,19 +1084,14 @@ def add_text_layer_to_page(
 
         # Debug mode: draw bounding box
         if debug:
-            points = [
-                (v.get('x', 0) * total_scale_x, v.get('y', 0) * total_scale_y)
-                for v in vertices
-            ]
-            shape = page.new_shape()
-            shape.draw_polyline(points + [points[0]])
-            shape.finish(color=(1, 0, 0), width=0.5)  # Red outline
-            shape.commit()
+            box_shape = shape or page.new_shape()
+            box_shape.draw_polyline(points + [points[0]])
+            box_shape.finish(color=(1, 0, 0), width=0.5)  # Red outline
+            if not batched:
+                box_shape.commit()
 
         # Insert text with combined scale and rotation matrix
         insert_pt = fitz.Point(insert_x, insert_y)
-        render_mode = 0 if debug else 3  # 0 = visible, 3 = invisible
-        text_color = (0, 0, 1) if debug else None  # Blue for debug
 
         # Build combined transformation matrix (scale + rotation)
         scale_matrix = fitz.Matrix(h_scale, 0, 0, 1, 0, 0)
@@ -296,7 +1099,7 @@ def add_text_layer_to_page(
         combined_matrix = scale_matrix * rot_matrix
 
         try:
-            page.insert_text(
+            (shape or page).insert_text(
                 insert_pt,
                 text,
                 fontsize=fontsize,
@@ -311,4 +1114,7 @@ def add_text_layer_to_page(
         except Exception as e:
             log.debug(f"Could not insert '{text}': {e}")
 
+    if shape is not None and (shape.text_cont or shape.totalcont):
+        shape.commit()
+
     return words_added
@@ -0,0 +1,570 @@
+import os
+import re
+import sys
+import json
+import time
+import fcntl
+import queue
+import atexit
+import base64
+import select
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from rmc.exporters.pdf import chrome_svg_to_pdf
+
+log = logging.getLogger(__name__)
+
+# Candidate Chrome executables, checked in order after $CHROME_PATH
+CHROME_CANDIDATES = [
+    'google-chrome',
+    'google-chrome-stable',
+    'chromium',
+    'chromium-browser',
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+]
+
+CHROME_ARGS = [
+    '--headless=new',
+    '--remote-debugging-pipe',
+    '--disable-gpu',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-sync',
+    '--mute-audio',
+    'about:blank',
+]
+
+# Seconds to wait for a single CDP reply before treating the browser as hung
+CDP_TIMEOUT = 60
+# Instances idle for longer than this are pinged before being reused
+HEALTH_CHECK_INTERVAL = 30
+# Browser instances per process, used to render a notebook's pages in parallel
+RENDER_POOL_SIZE = 2
+
+# Conversion factors from SVG length units to CSS inches
+_UNITS_PER_INCH = {'px': 96, '': 96, 'pt': 72, 'in': 1, 'cm': 2.54, 'mm': 25.4}
+
+
+class RenderError(Exception):
+    """Raised when a browser instance fails to render a document."""
+
+
+def find_chrome() -> str | None:
+    """
+    Locate a Chrome/Chromium executable.
+
+    :returns: Path to the executable, or None if not found
+    """
+    env_path = os.environ.get('CHROME_PATH')
+    if env_path:
+        return env_path
+    for candidate in CHROME_CANDIDATES:
+        found = shutil.which(candidate)
+        if found:
+            return found
+        if os.path.isabs(candidate) and os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def svg_page_size(svg: str) -> tuple[float, float]:
+    """
+    Get the page size of an SVG document in inches from its root element.
+
+    :param svg: SVG document text
+    :returns: (width_in, height_in)
+    """
+    root = re.search(r'<svg\b[^>]*>', svg)
+    if not root:
+        raise RenderError('No <svg> element found')
+    size = []
+    for attr in ('width', 'height'):
+        m = re.search(rf'\b{attr}="([\d.]+)\s*([a-z]*)"', root.group(0))
+        if not m or m.group(2) not in _UNITS_PER_INCH:
+            raise RenderError(f'Unsupported SVG {attr}')
+        size.append(float(m.group(1)) / _UNITS_PER_INCH[m.group(2)])
+    return size[0], size[1]
+
+
+def svg_to_html(svg: str, width_in: float, height_in: float) -> str:
+    """Wrap an SVG document in an HTML page sized to print on a single page."""
+    svg = re.sub(r'^\s*<\?xml[^>]*\?>', '', svg)
+    return (
+        '<!DOCTYPE html><html><head><style>'
+        f'@page {{ size: {width_in}in {height_in}in; margin: 0; }}'
+        'html, body { margin: 0; padding: 0; }'
+        'body > svg { display: block; }'
+        f'</style></head><body>{svg}</body></html>'
+    )
+
+
+class ChromeInstance:
+    """
+    A single headless Chrome process driven over the DevTools pipe protocol.
+
+    Chrome reads CDP messages from fd 3 and writes replies to fd 4, each
+    message being JSON terminated by a NUL byte.
+    """
+
+    def __init__(self, chrome_path: str):
+        self.chrome_path = chrome_path
+        self.proc: subprocess.Popen | None = None
+        self.profile_dir: tempfile.TemporaryDirectory | None = None
+        self.session_id: str | None = None
+        self.frame_id: str | None = None
+        self.last_used = 0.0
+        self._next_id = 0
+        self._buf = b''
+        self._to_chrome = None
+        self._from_chrome = None
+
+    def start(self):
+        """Launch Chrome and open a page to render into."""
+        self.profile_dir = tempfile.TemporaryDirectory(prefix='rm-viewer-chrome-')
+        cmd_r, cmd_w = os.pipe()
+        out_r, out_w = os.pipe()
+
+        def move_pipes():
+            # Runs in the child before exec. Copy both ends above any fd they
+            # could collide with first, as either may already be 3 or 4. Only
+            # 3 and 4 (dup2 makes them inheritable) survive the exec
+            high_r = fcntl.fcntl(cmd_r, fcntl.F_DUPFD_CLOEXEC, 10)
+            high_w = fcntl.fcntl(out_w, fcntl.F_DUPFD_CLOEXEC, 10)
+            os.dup2(high_r, 3)
+            os.dup2(high_w, 4)
+
+        try:
+            # Chrome expects the pipe on fds 3 and 4. Shells can't be relied on
+            # to redirect from fds above 9 (dash can't), so move them ourselves
+            self.proc = subprocess.Popen(
+                [
+                    self.chrome_path,
+                    f'--user-data-dir={self.profile_dir.name}',
+                    *CHROME_ARGS,
+                ],
+                # Nothing else is inheritable (PEP 446), and closing fds would
+                # undo move_pipes
+                close_fds=False,
+                preexec_fn=move_pipes,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        finally:
+            os.close(cmd_r)
+            os.close(out_w)
+        self._to_chrome = os.fdopen(cmd_w, 'wb', buffering=0)
+        self._from_chrome = out_r
+
+        target = self.send('Target.createTarget', {'url': 'about:blank'})
+        attached = self.send('Target.attachToTarget', {
+            'targetId': target['targetId'], 'flatten': True
+        })
+        self.session_id = attached['sessionId']
+        self.send('Page.enable', session=True)
+        tree = self.send('Page.getFrameTree', session=True)
+        self.frame_id = tree['frameTree']['frame']['id']
+        self.last_used = time.monotonic()
+
+    def close(self):
+        """Shut down the Chrome process and remove its profile directory."""
+        if self._to_chrome:
+            try:
+                self.send('Browser.close', timeout=5)
+            except (RenderError, OSError):
+                pass
+            self._to_chrome.close()
+            self._to_chrome = None
+        if self._from_chrome is not None:
+            os.close(self._from_chrome)
+            self._from_chrome = None
+        if self.proc:
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+            self.proc = None
+        if self.profile_dir:
+            self.profile_dir.cleanup()
+            self.profile_dir = None
+
+    def is_alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def health_check(self) -> bool:
+        """Check the browser process is running and answering commands."""
+        if not self.is_alive():
+            return False
+        try:
+            self.send('Browser.getVersion', timeout=5)
+            return True
+        except (RenderError, OSError):
+            return False
+
+    def send(self, method: str, params: dict | None = None,
+             session: bool = False, timeout: float = CDP_TIMEOUT) -> dict:
+        """
+        Send a CDP command and wait for its reply, skipping any events.
+
+        :param method: CDP method name
+        :param params: Method parameters
+        :param session: Send to the attached page session rather than the browser
+        :param timeout: Seconds to wait for the reply
+        :returns: The command's result dict
+        """
+        self._next_id += 1
+        msg_id = self._next_id
+        msg = {'id': msg_id, 'method': method, 'params': params or {}}
+        if session:
+            msg['sessionId'] = self.session_id
+        self._to_chrome.write(json.dumps(msg).encode() + b'\0')
+
+        deadline = time.monotonic() + timeout
+        while True:
+            reply = self._read_message(deadline)
+            if reply.get('id') != msg_id:
+                continue
+            if 'error' in reply:
+                raise RenderError(f"{method} failed: {reply['error'].get('message')}")
+            return reply.get('result', {})
+
+    def _read_message(self, deadline: float) -> dict:
+        while b'\0' not in self._buf:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RenderError('Timed out waiting for Chrome')
+            ready, _, _ = select.select([self._from_chrome], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(self._from_chrome, 1 << 16)
+            if not chunk:
+                raise RenderError('Chrome closed the DevTools pipe')
+            self._buf += chunk
+        raw, self._buf = self._buf.split(b'\0', 1)
+        return json.loads(raw)
+
+    def render_svg(self, svg: str) -> bytes:
+        """
+        Print an SVG document to a single-page PDF.
+
+        :param svg: SVG document text
+        :returns: PDF file bytes
+        """
+        width_in, height_in = svg_page_size(svg)
+        self.send('Page.setDocumentContent', {
+            'frameId': self.frame_id,
+            'html': svg_to_html(svg, width_in, height_in),
+        }, session=True)
+        result = self.send('Page.printToPDF', {
+            'paperWidth': width_in,
+            'paperHeight': height_in,
+            'marginTop': 0,
+            'marginBottom': 0,
+            'marginLeft': 0,
+            'marginRight': 0,
+            'printBackground': True,
+            'preferCSSPageSize': True,
+        }, session=True)
+        self.last_used = time.monotonic()
+        return base64.b64decode(result['data'])
+
+
+class RenderPool:
+    """
+    Pool of warm headless Chrome instances that turn SVG into PDF bytes.
+
+    Instances are started on demand up to `size`, health-checked when they
+    have been idle, and restarted if they crash or hang mid-render.
+    """
+
+    def __init__(self, chrome_path: str, size: int = 1):
+        self.chrome_path = chrome_path
+        self.size = max(1, size)
+        self._idle: queue.Queue[ChromeInstance] = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Per-page latency stats
+        self.pages_rendered = 0
+        self.render_seconds = 0.0
+        self.max_render_seconds = 0.0
+        self.restarts = 0
+
+    def _acquire(self) -> ChromeInstance:
+        with self._lock:
+            if self._idle.empty() and self._started < self.size:
+                self._started += 1
+                spawn = True
+            else:
+                spawn = False
+        if spawn:
+            try:
+                return self._launch()
+            except Exception:
+                with self._lock:
+                    self._started -= 1
+                raise
+
+        instance = self._idle.get()
+        idle_for = time.monotonic() - instance.last_used
+        if idle_for > HEALTH_CHECK_INTERVAL and not instance.health_check():
+            log.warning('Chrome instance failed health check, restarting')
+            try:
+                instance = self._restart(instance)
+            except Exception:
+                # The old instance is gone, so give up its slot
+                with self._lock:
+                    self._started -= 1
+                raise
+        return instance
+
+    def _launch(self) -> ChromeInstance:
+        instance = ChromeInstance(self.chrome_path)
+        try:
+            instance.start()
+        except Exception:
+            instance.close()
+            raise
+        log.debug('Started Chrome render instance')
+        return instance
+
+    def _restart(self, instance: ChromeInstance) -> ChromeInstance:
+        instance.close()
+        with self._lock:
+            self.restarts += 1
+        return self._launch()
+
+    def _release(self, instance: ChromeInstance):
+        if self._closed:
+            instance.close()
+            return
+        self._idle.put(instance)
+
+    def render(self, svg: str) -> bytes:
+        """
+        Render an SVG document to PDF bytes, retrying once on a fresh browser
+        if the first attempt fails.
+
+        :param svg: SVG document text
+        :returns: PDF file bytes
+        """
+        if self._closed:
+            raise RenderError('Render pool is closed')
+        instance = self._acquire()
+        start = time.perf_counter()
+        try:
+            try:
+                pdf = instance.render_svg(svg)
+            except (RenderError, OSError) as e:
+                log.warning(f'Chrome render failed ({e}), restarting instance')
+                instance = self._restart(instance)
+                pdf = instance.render_svg(svg)
+        except Exception:
+            # Don't hand a broken instance back to the pool
+            instance.close()
+            with self._lock:
+                self._started -= 1
+            raise
+        self._release(instance)
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.pages_rendered += 1
+            self.render_seconds += elapsed
+            self.max_render_seconds = max(self.max_render_seconds, elapsed)
+        log.debug(f'Rendered page in {elapsed * 1000:.0f} ms')
+        return pdf
+
+    def render_many(self, svgs: list[str]) -> list[bytes | Exception]:
+        """
+        Render a batch of SVG documents, spread across the pool's instances.
+
+        :param svgs: SVG document texts
+        :returns: PDF bytes for each document in order, or the exception
+                  raised while rendering it
+        """
+        def render_one(svg: str) -> bytes | Exception:
+            try:
+                return self.render(svg)
+            except Exception as e:
+                return e
+
+        workers = min(self.size, len(svgs))
+        if workers <= 1:
+            return [render_one(svg) for svg in svgs]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(render_one, svgs))
+
+    def stats(self) -> dict:
+        """Latency stats for pages rendered so far."""
+        with self._lock:
+            return {
+                'pages_rendered': self.pages_rendered,
+                'render_seconds': self.render_seconds,
+                'max_render_seconds': self.max_render_seconds,
+                'restarts': self.restarts,
+            }
+
+    def close(self):
+        """Shut down all idle browser instances."""
+        self._closed = True
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+_pool: RenderPool | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+_pool_unavailable = False
+
+
+def get_render_pool() -> RenderPool | None:
+    """
+    Get this process's shared render pool, creating it on first use.
+
+    Each process (including pool workers) gets its own browsers. Returns None
+    if no Chrome executable could be found, in which case callers should fall
+    back to rmc's one-shot chrome_svg_to_pdf.
+    """
+    global _pool, _pool_pid, _pool_unavailable
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            return _pool
+        if _pool_unavailable:
+            return None
+        chrome_path = find_chrome()
+        if not chrome_path:
+            log.warning('Chrome not found, falling back to one-shot rendering')
+            _pool_unavailable = True
+            return None
+        # A pool inherited over fork belongs to the parent; start our own
+        _pool = RenderPool(chrome_path, size=RENDER_POOL_SIZE)
+        _pool_pid = os.getpid()
+        atexit.register(close_render_pool)
+        return _pool
+
+
+def close_render_pool():
+    """
+    Shut down this process's shared render pool, if it has one.
+
+    Registered with atexit for the main process. Pool workers exit without
+    running atexit handlers, so they must call this themselves (see
+    rm_process._init_worker).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        pool = _pool if _pool_pid == os.getpid() else None
+        if pool is not None:
+            _pool, _pool_pid = None, None
+    if pool is not None:
+        pool.close()
+
+
+def render_pool_stats() -> dict | None:
+    """
+    Get RenderPool.stats() for this process's shared pool.
+
+    :returns: Stats dict, or None if the pool hasn't been started
+    """
+    with _pool_lock:
+        pool = _pool if _pool_pid == os.getpid() else None
+    return pool.stats() if pool is not None else None
+
+
+def render_svg_file_to_pdf(svg_path: str | Path, pdf_path: str | Path):
+    """
+    Drop-in replacement for rmc's chrome_svg_to_pdf using the shared pool.
+
+    Falls back to a one-shot Chrome process if the pool is unavailable or the
+    render fails.
+    """
+    pool = get_render_pool()
+    if pool is not None:
+        try:
+            svg = Path(svg_path).read_text()
+            Path(pdf_path).write_bytes(pool.render(svg))
+            return
+        except Exception as e:
+            log.warning(f'Pooled render failed, falling back to one-shot Chrome: {e}')
+    chrome_svg_to_pdf(str(svg_path), str(pdf_path))
+
+
+def _oneshot_svg_to_pdf(svg: str, pdf_path: Path):
+    """Render SVG text with a one-shot Chrome process via a temp file."""
+    with tempfile.NamedTemporaryFile(suffix='.svg', mode='w', delete=False) as f_temp:
+        f_temp.write(svg)
+        temp_svg_path = f_temp.name
+    try:
+        chrome_svg_to_pdf(temp_svg_path, str(pdf_path))
+    finally:
+        Path(temp_svg_path).unlink(missing_ok=True)
+
+
+def render_svgs_to_pdfs(svgs: list[str], pdf_paths: list[Path]) -> list[float]:
+    """
+    Render a batch of SVG documents (e.g. all changed pages of a notebook) to
+    PDF files in one call.
+
+    Pages are printed in memory across the shared pool's warm browsers. Any
+    page the pool can't render falls back to a one-shot Chrome process.
+
+    :param svgs: SVG document texts
+    :param pdf_paths: Output PDF path for each SVG
+    :returns: Per-page render time in seconds, in input order
+    """
+    if not svgs:
+        return []
+
+    start = time.perf_counter()
+    pool = get_render_pool()
+    if pool is not None:
+        results = pool.render_many(svgs)
+    else:
+        results = [None] * len(svgs)
+    # Pooled pages render concurrently, so attribute the wall time evenly
+    pooled_seconds = (time.perf_counter() - start) / len(svgs)
+
+    timings = []
+    for svg, pdf_path, result in zip(svgs, pdf_paths, results):
+        if isinstance(result, bytes):
+            Path(pdf_path).write_bytes(result)
+            timings.append(pooled_seconds)
+            continue
+        if result is not None:
+            log.warning(f'Pooled render failed, falling back to one-shot Chrome: {result}')
+        page_start = time.perf_counter()
+        _oneshot_svg_to_pdf(svg, pdf_path)
+        timings.append(time.perf_counter() - page_start)
+    return timings
+
+
+@contextmanager
+def pooled_chrome_svg_to_pdf():
+    """
+    Route rmc's chrome_svg_to_pdf through the shared pool for the duration of
+    the block, so that libraries calling it (i.e. remarks) reuse warm browsers.
+    """
+    patched = []
+    for name, module in list(sys.modules.items()):
+        if name.split('.')[0] not in ('rmc', 'remarks'):
+            continue
+        if getattr(module, 'chrome_svg_to_pdf', None) is chrome_svg_to_pdf:
+            setattr(module, 'chrome_svg_to_pdf', render_svg_file_to_pdf)
+            patched.append(module)
+    try:
+        yield
+    finally:
+        for module in patched:
+            setattr(module, 'chrome_svg_to_pdf', chrome_svg_to_pdf)
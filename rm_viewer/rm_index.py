@@ -20,14 +20,24 @@ class RemarkableIndex:
         self.search_indices: dict[str, dict] = {}  # id -> search_index contents
         self.rebuild()
 
-    def rebuild(self):
-        """(Re)build the full index from disk."""
-        self.items.clear()
-        self.search_indices.clear()
+    def rebuild(self, ids: set[str] | None = None):
+        """
+        (Re)build the index from disk.
+
+        With ids, only those documents are re-read from disk; the rest are
+        carried over from the current index. The tree is always rebuilt from
+        metadata.json, so added, moved and removed items are picked up either
+        way. The new index is swapped in once complete.
+
+        :param ids: IDs of the items that changed, or None to re-read everything
+        """
+        items: dict[str, RemarkableItem] = {}
+        search_indices: dict[str, dict] = {}
 
         metadata_path = self.output_dir / 'metadata.json'
         if not metadata_path.exists():
             log.warning(f"No metadata.json found in {self.output_dir}")
+            self.items, self.search_indices = items, search_indices
             return
 
         with open(metadata_path) as f:
@@ -35,22 +45,28 @@ class RemarkableIndex:
 
         # First pass: create all items
         for raw in raw_items:
-            item = self._build_item(raw)
+            old = self.items.get(raw.get('id', ''))
+            if ids is not None and raw.get('id') not in ids and isinstance(old, RemarkableDocument):
+                items[old.id] = old
+                if old.id in self.search_indices:
+                    search_indices[old.id] = self.search_indices[old.id]
+                continue
+            item = self._build_item(raw, search_indices)
             if item:
-                self.items[item.id] = item
+                items[item.id] = item
 
         # Create virtual root folder
         root = RemarkableFolder(
             id='root', name='My files', item_type='folder', parent_id=''
         )
-        self.items['root'] = root
+        items['root'] = root
 
         # Second pass: build parent→children relationships
-        for item_id, item in self.items.items():
+        for item_id, item in items.items():
             if item_id == 'root':
                 continue
             parent_id = item.parent_id if item.parent_id else 'root'
-            parent = self.items.get(parent_id)
+            parent = items.get(parent_id)
             if isinstance(parent, RemarkableFolder):
                 parent.children.append(item_id)
             else:
@@ -58,9 +74,11 @@ class RemarkableIndex:
                 root.children.append(item_id)
 
         # Third pass: compute folder timestamps (max of descendants)
-        self._compute_folder_timestamps('root')
+        self._compute_folder_timestamps(items, 'root')
+
+        self.items, self.search_indices = items, search_indices
 
-    def _build_item(self, raw: dict) -> RemarkableItem | None:
+    def _build_item(self, raw: dict, search_indices: dict[str, dict]) -> RemarkableItem | None:
         item_id = raw.get('id', '')
         name = raw.get('name', '')
         parent_id = raw.get('parent', '')
@@ -118,7 +136,7 @@ class RemarkableIndex:
                     search_index_path = si
                     try:
                         with open(si) as f:
-                            self.search_indices[item_id] = json.load(f)
+                            search_indices[item_id] = json.load(f)
                     except Exception:
                         log.warning(f"Failed to load search index for {name}")
 
@@ -143,11 +161,13 @@ class RemarkableIndex:
 
         return None
 
-    def _compute_folder_timestamps(self, folder_id: str) -> tuple[str | None, str | None, str | None]:
+    def _compute_folder_timestamps(
+        self, items: dict[str, RemarkableItem], folder_id: str
+    ) -> tuple[str | None, str | None, str | None]:
         """Recursively compute folder timestamps as max of all descendants."""
-        folder = self.items.get(folder_id)
+        folder = items.get(folder_id)
         if not isinstance(folder, RemarkableFolder):
-            item = self.items.get(folder_id)
+            item = items.get(folder_id)
             if item:
                 return item.last_modified, item.last_opened, item.date_created
             return None, None, None
@@ -157,7 +177,7 @@ class RemarkableIndex:
         max_created = None
 
         for child_id in folder.children:
-            m, o, c = self._compute_folder_timestamps(child_id)
+            m, o, c = self._compute_folder_timestamps(items, child_id)
             max_modified = max(filter(None, [max_modified, m]), default=None)
             max_opened = max(filter(None, [max_opened, o]), default=None)
             max_created = max(filter(None, [max_created, c]), default=None)
@@ -5,52 +5,277 @@ import hashlib
 import logging
 import argparse
 import tempfile
+import threading
+import time
 import traceback
 import zipfile
+from io import StringIO
 from pathlib import Path
+from typing import Callable
+from dataclasses import replace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
 
 import fitz
 import xxhash
 from remarks import run_remarks
-from rmc.exporters.svg import set_device, set_dimensions_for_pdf
-from rmc.exporters.pdf import rm_to_svg, chrome_svg_to_pdf
-
-from .utils import validate_path, validate_output_path, get_gcv_api_key
-from .ocr import run_ocr_on_rm_output, add_text_layer_to_page
+from rmscene import read_tree
+from rmc.exporters.svg import set_device, set_dimensions_for_pdf, tree_to_svg
+
+from .utils import (
+    validate_path, validate_output_path, validate_jobs, validate_jpeg_quality, validate_non_negative,
+    get_gcv_api_key,
+    setup_logger, stage_file, stage_tree, restage_file, locked, write_json_atomic,
+    append_json_line, read_json_lines
+)
+from .ocr import (
+    OCR_SUFFIX, LEGACY_OCR_SUFFIX, OCR_CACHE_DIR, OCR_USAGE_FILE, GCV_REQUESTS_PER_MINUTE,
+    METADATA_LOCK_FILE,
+    OCRImageOptions, OCRCache, OCRBudget,
+    run_ocr_on_rm_outputs, is_blank_page, load_ocr_result,
+    get_ocr_full_text, add_text_layer_to_page
+)
+from .render import render_svgs_to_pdfs, pooled_chrome_svg_to_pdf, render_pool_stats, close_render_pool
 
 log = logging.getLogger(__name__)
 
-def xx_dir_hash(directory: Path) -> str:
-    """Compute a hash of all files in directory for change detection."""
+# Max .rm pages converted to SVG and held in memory per render batch
+RENDER_BATCH_SIZE = 32
+
+# Read size for streaming files into hashers
+HASH_CHUNK_SIZE = 1 << 20
+
+# Above this fraction of changed pages, rerun remarks over the whole notebook
+# rather than splicing changed pages into the previous output
+INCREMENTAL_MAX_CHANGED_FRACTION = 0.5
+
+# Item IDs with pages waiting on OCR, worked through by process_ocr_queue()
+OCR_QUEUE_FILE = 'ocr_queue.json'
+
+# Items finished so far by the current run, one JSON line each. Only left
+# behind if a run is interrupted, in which case the next run resumes from it
+PROCESS_JOURNAL_FILE = 'process_journal.jsonl'
+
+# Min seconds between mid-run metadata.json updates; items finishing in
+# between are published together
+PUBLISH_INTERVAL_SECONDS = 5
+
+# .content keys that are device bookkeeping and don't affect rendered output
+CONTENT_BOOKKEEPING_KEYS = {
+    'cPages', 'pages', 'coverPageNumber', 'lastOpenedPage', 'extraMetadata',
+    'sizeInBytes', 'pageCount', 'originalPageCount', 'tags', 'pageTags',
+    'redirectionPageMap', 'customZoomCenterX', 'customZoomCenterY',
+    'customZoomOrientation', 'customZoomPageHeight', 'customZoomPageWidth',
+    'customZoomScale', 'zoomMode', 'dummyDocument'
+}
+
+def compute_source_hash(id: str, files: list[Path]) -> tuple[str, dict[str, str]]:
+    """Compute hashes from source xochitl files for change detection.
+
+    Hashes the files in place in a single streaming pass, keyed by the paths
+    they would have once copied into nb_xochitl_dir. This gives both a digest
+    of the whole item (stored as xochitl_dir_hash) and an xxh3 digest of each
+    file, used for page-level (.rm) and layout caching.
+
+    :returns: Tuple of (directory digest, mapping of relative path -> file digest)
+    """
+    entries = []
+    for file in files:
+        if file.is_dir():
+            for f in file.rglob('*'):
+                if f.is_file():
+                    entries.append((Path(file.name) / f.relative_to(file), f))
+        else:
+            entries.append((Path(file.name), file))
+
+    dir_hash = xxhash.xxh3_64()
+    file_hashes = {}
+    for rel_path, f in sorted(entries):
+        dir_hash.update(str(rel_path).encode())
+        file_hash = xxhash.xxh3_64()
+        with open(f, 'rb') as fh:
+            while chunk := fh.read(HASH_CHUNK_SIZE):
+                dir_hash.update(chunk)
+                file_hash.update(chunk)
+        file_hashes[str(rel_path)] = file_hash.hexdigest()
+    return dir_hash.hexdigest(), file_hashes
+
+
+def compute_render_hash(id: str, file_hashes: dict[str, str]) -> str:
+    """Hash every source file except the .metadata and .content bookkeeping files.
+
+    Together with the item's assembly keys (which cover the parts of .content
+    that affect rendering), this tells apart changes that need the item
+    re-rendered from ones that only touch its metadata.
+
+    :param file_hashes: File digests from compute_source_hash()
+    """
     h = xxhash.xxh3_64()
-    for f in sorted(directory.rglob('*')):
-        if f.is_file():
-            h.update(str(f.relative_to(directory)).encode())
-            h.update(f.read_bytes())
+    for rel_path, digest in sorted(file_hashes.items()):
+        if rel_path in (f'{id}.metadata', f'{id}.content'):
+            continue
+        h.update(f'{rel_path}:{digest}\n'.encode())
     return h.hexdigest()
 
 
-def compute_source_hash(id: str, files: list[Path]) -> str:
-    """Compute hash from source xochitl files for change detection.
+def rebase_item_paths(item: dict, old_dir: str, new_dir: str) -> dict:
+    """
+    Copy a book's metadata with its output paths moved from old_dir to new_dir,
+    after its output directory was renamed.
 
-    Copies files to a temp directory to get the same structure as nb_xochitl_dir,
-    then computes the hash.
+    :param old_dir: Old output directory name, relative to the output dir
+    :param new_dir: New output directory name
     """
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        tmp_path = Path(tmp_dir)
-        for file in files:
-            if file.is_dir():
-                shutil.copytree(file, tmp_path / file.name)
-            else:
-                shutil.copy(file, tmp_path)
-        return xx_dir_hash(tmp_path)
+    def rebase(path):
+        if path and Path(path).parts[0] == old_dir:
+            return str(Path(new_dir, *Path(path).parts[1:]))
+        return path
+
+    item = item.copy()
+    for key in ('xochitl_dir', 'output_pdf', 'backing_pdf', 'thumbnail_dir'):
+        item[key] = rebase(item.get(key, ''))
+    item['rm_files'] = [
+        {**rm_file, **{k: rebase(rm_file.get(k)) for k in ('rm_path', 'out_path', 'ocr_path')}}
+        for rm_file in item.get('rm_files', [])
+    ]
+    item['thumbnail_pages'] = [
+        {**thumbnail, 'thumbnail_path': rebase(thumbnail['thumbnail_path'])}
+        for thumbnail in item.get('thumbnail_pages', [])
+    ]
+    return item
+
+
+def get_rm_hashes(id: str, file_hashes: dict[str, str]) -> dict[str, str]:
+    """Pick out the .rm page digests from compute_source_hash's file hashes.
+
+    :returns: Mapping of page ID -> rm_hash
+    """
+    rm_hashes = {}
+    for rel_path, digest in file_hashes.items():
+        path = Path(rel_path)
+        if path.parts[0] == id and path.suffix == '.rm':
+            rm_hashes[path.stem] = digest
+    return rm_hashes
+
+
+def get_highlight_hashes(id: str, file_hashes: dict[str, str]) -> dict[str, str]:
+    """Pick out the {id}.highlights/<page>.json digests from compute_source_hash's file hashes.
+
+    :returns: Mapping of page ID -> highlights_hash
+    """
+    highlight_hashes = {}
+    for rel_path, digest in file_hashes.items():
+        path = Path(rel_path)
+        if path.parts[0] == f'{id}.highlights' and path.suffix == '.json':
+            highlight_hashes[path.stem] = digest
+    return highlight_hashes
+
+
+def migrate_rm_hashes(metadata: list[dict], output_dir: Path) -> int:
+    """Convert MD5 rm_hash values from older metadata.json files to xxh3.
+
+    Each MD5 is checked against the .rm file in the item's copied xochitl
+    directory before being replaced with that file's xxh3 digest, so OCR,
+    render and thumbnail caches carry over. Hashes that can't be verified are
+    left alone and will simply miss the cache.
+
+    :returns: Number of rm_hash values migrated
+    """
+    migrated = 0
+    for item in metadata:
+        if item.get('type') != 'book':
+            continue
+        md5_to_xxh3 = {}
+        for rm_file in item.get('rm_files', []):
+            old_hash = rm_file.get('rm_hash') or ''
+            if len(old_hash) != 32:
+                continue
+            rm_path = output_dir / rm_file.get('rm_path', '')
+            if not rm_path.is_file():
+                continue
+            data = rm_path.read_bytes()
+            if hashlib.md5(data).hexdigest() == old_hash:
+                md5_to_xxh3[old_hash] = xxhash.xxh3_64(data).hexdigest()
+
+        if not md5_to_xxh3:
+            continue
+        pages = item.get('rm_files', []) + item.get('thumbnail_pages', [])
+        for page in pages:
+            if page.get('rm_hash') in md5_to_xxh3:
+                page['rm_hash'] = md5_to_xxh3[page['rm_hash']]
+                migrated += 1
+        for key in item.get('assembly', {}).get('pages', []):
+            if key[2] in md5_to_xxh3:
+                key[2] = md5_to_xxh3[key[2]]
+    return migrated
+
+
+def stat_signature(files: list[Path]) -> list[list]:
+    """Get a cheap change signature for an item's source files without reading them.
+
+    :returns: Sorted list of [relative path, size, mtime_ns, inode] per file
+    """
+    signature = []
+    for file in files:
+        paths = [f for f in file.rglob('*') if f.is_file()] if file.is_dir() else [file]
+        for f in paths:
+            st = f.stat()
+            rel_path = str(f.relative_to(file.parent))
+            signature.append([rel_path, st.st_size, st.st_mtime_ns, st.st_ino])
+    signature.sort()
+    return signature
+
+
+def get_recency(files: list[Path]) -> int:
+    '''
+    Get when an item was last used, from its .metadata lastModified and
+    lastOpened timestamps.
+
+    :returns: Latest of the two in ms since the epoch, or 0 if unknown
+    '''
+    for file in files:
+        if str(file).endswith('.metadata'):
+            try:
+                with open(file) as f:
+                    metadata = json.load(f)
+                return max(
+                    int(metadata.get('lastModified') or 0),
+                    int(metadata.get('lastOpened') or 0)
+                )
+            except (OSError, ValueError, TypeError):
+                return 0
+    return 0
+
+
+def chrome_pool_stats_since(before: dict | None) -> dict:
+    """
+    Work out how much the shared Chrome pool did since an earlier
+    render_pool_stats() snapshot, covering pages printed for remarks as well
+    as batch-rendered ones.
+
+    :returns: Dict of chrome_pages, chrome_seconds, chrome_max_seconds and
+              chrome_restarts
+    """
+    after = render_pool_stats()
+    if after is None:
+        return {'chrome_pages': 0, 'chrome_seconds': 0.0, 'chrome_max_seconds': 0.0, 'chrome_restarts': 0}
+    before = before or {}
+    pages = after['pages_rendered'] - before.get('pages_rendered', 0)
+    return {
+        'chrome_pages': pages,
+        'chrome_seconds': after['render_seconds'] - before.get('render_seconds', 0.0),
+        # The pool only tracks its all-time max, which is fine for a run-wide max
+        'chrome_max_seconds': after['max_render_seconds'] if pages else 0.0,
+        'chrome_restarts': after['restarts'] - before.get('restarts', 0),
+    }
 
 
 def call_remarks(xochitl_dir: Path, output_dir: Path) -> bool:
     """Run remarks on xochitl directory. Returns True on success."""
     log.info(f"Running remarks on {xochitl_dir}")
     try:
-        run_remarks(xochitl_dir, output_dir)
+        with pooled_chrome_svg_to_pdf():
+            run_remarks(xochitl_dir, output_dir)
         return True
     except Exception as e:
         log.warning(f"remarks failed: {e}")
@@ -71,18 +296,93 @@ def build_process_parser(parser: argparse._SubParsersAction):
         'output_dir', type=validate_output_path,
         help="Path to put processed xochitl files"
     )
-    process_parser.add_argument(
-        '--ocr-debug', action='store_true',
-        help="Make OCR text visible for debugging alignment"
-    )
+    add_ocr_arguments(process_parser)
     process_parser.add_argument(
         '--no-ocr', action='store_true',
         help="Disable OCR even if API key is available"
     )
+    process_parser.add_argument(
+        '--defer-ocr', action='store_true',
+        help="Publish notebooks without waiting on OCR, leaving it to ocr-worker"
+    )
     process_parser.add_argument(
         '--no-thumbnails', action='store_true',
         help="Skip thumbnail generation"
     )
+    process_parser.add_argument(
+        '--jobs', '-j', type=validate_jobs, default=1,
+        help="Number of items to process in parallel (default: 1)"
+    )
+
+
+def build_ocr_worker_parser(parser: argparse._SubParsersAction):
+    worker_parser = parser.add_parser(
+        'ocr-worker',
+        help='OCR pages left queued by "processor --defer-ocr", adding their '
+            'text layers and search text.'
+    )
+    worker_parser.add_argument(
+        'output_dir', type=validate_path,
+        help="Path to processed output dir (the one containing metadata.json)"
+    )
+    add_ocr_arguments(worker_parser)
+
+
+def add_ocr_arguments(parser: argparse.ArgumentParser):
+    """Add the OCR options shared by the processor, ocr-worker and syncd commands."""
+    parser.add_argument(
+        '--ocr-debug', action='store_true',
+        help="Make OCR text visible for debugging alignment"
+    )
+    parser.add_argument(
+        '--ocr-grayscale', action='store_true',
+        help="Send grayscale page images for OCR (smaller uploads)"
+    )
+    parser.add_argument(
+        '--ocr-format', choices=['png', 'jpeg'], default='png',
+        help="Image encoding used for OCR uploads (default: png)"
+    )
+    parser.add_argument(
+        '--ocr-jpeg-quality', type=validate_jpeg_quality, default=90,
+        help="JPEG quality for --ocr-format jpeg (default: 90)"
+    )
+    parser.add_argument(
+        '--ocr-full-page', action='store_true',
+        help="Send whole pages for OCR instead of cropping to the handwriting"
+    )
+    parser.add_argument(
+        '--ocr-cache-mb', type=int, default=512,
+        help="Size limit of the shared OCR cache in MB, 0 to disable (default: 512)"
+    )
+    add_ocr_budget_arguments(parser)
+
+
+def add_ocr_budget_arguments(parser: argparse.ArgumentParser):
+    """Add the GCV rate limit and budget options."""
+    parser.add_argument(
+        '--ocr-rate', type=validate_non_negative, default=GCV_REQUESTS_PER_MINUTE,
+        help=f"Max GCV requests per minute, 0 for no limit (default: {GCV_REQUESTS_PER_MINUTE})"
+    )
+    parser.add_argument(
+        '--ocr-max-pages-per-run', type=validate_non_negative, default=0,
+        help="Max pages sent for OCR per run, 0 for no limit; the rest are "
+            "deferred to later runs (default: 0)"
+    )
+    parser.add_argument(
+        '--ocr-max-pages-per-day', type=validate_non_negative, default=0,
+        help="Max pages sent for OCR per day, 0 for no limit; the rest are "
+            "deferred to later runs (default: 0)"
+    )
+
+
+def ocr_options_from_args(args: argparse.Namespace) -> OCRImageOptions:
+    """Build OCRImageOptions from arguments added by add_ocr_arguments()."""
+    return OCRImageOptions(
+        grayscale=getattr(args, 'ocr_grayscale', False),
+        image_format=getattr(args, 'ocr_format', 'png'),
+        jpeg_quality=getattr(args, 'ocr_jpeg_quality', 90),
+        crop_to_ink=not getattr(args, 'ocr_full_page', False),
+    )
 
 
 def create_id_filemap(xochitl_dir: Path) -> dict[str, list[Path]]:
@@ -152,32 +452,117 @@ def get_page_redir_map(content: dict) -> dict[str, int | None]:
     return redir_map
 
 
-def rm_to_pdf_no_text(rm_path, pdf_path):
+def is_unannotated(id: str, content: dict, file_hashes: dict[str, str], backing_pdf: Path) -> bool:
+    """
+    Check whether a PDF/EPUB document's output would just be its backing PDF.
+
+    That's the case when it has no .rm pages or highlights, and its pages are
+    exactly the backing PDF's, in their original order (none inserted,
+    deleted or moved).
+
+    :param file_hashes: File digests from compute_source_hash()
+    :param backing_pdf: The document's staged {id}.pdf
+    """
+    if content.get('fileType') not in ('pdf', 'epub') or not backing_pdf.exists():
+        return False
+    for rel_path in file_hashes:
+        path = Path(rel_path)
+        if path.suffix == '.rm' or path.parts[0] == f'{id}.highlights':
+            return False
+
+    pages = get_pages(content)
+    redir_map = get_page_redir_map(content)
+    with fitz.open(backing_pdf) as doc:
+        page_count = doc.page_count
+    return [redir_map.get(page_id) for page_id in pages] == list(range(page_count))
+
+
+def rm_to_svg_no_text(rm_path) -> str:
     '''
-    Convert .rm file to PDF, and hide text.
+    Convert .rm file to SVG text in memory, and hide text.
+
+    Uses the dimensions last set with set_device/set_dimensions_for_pdf.
     '''
-    with tempfile.NamedTemporaryFile(suffix=".svg", mode="w", delete=False) as f_temp:
-        rm_to_svg(rm_path, f_temp.name)
-        temp_svg_path = f_temp.name
+    with open(rm_path, 'rb') as f:
+        tree = read_tree(f)
+    svg = StringIO()
+    tree_to_svg(tree, svg)
 
     # hack to hide text
     new = ''
-    with open(temp_svg_path, 'r') as f:
-        lines = f.readlines()
-        for i, line in enumerate(lines):
-            new += line
-            if i >= len(lines) - 2:
-                continue
-            if line.strip().startswith('text {') and \
-                    lines[i+1].strip().startswith('font-family'): #}
-                new += 'display: none;\n'
-    with open(temp_svg_path, 'w') as f:
-        f.write(new)
+    lines = svg.getvalue().splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        new += line
+        if i >= len(lines) - 2:
+            continue
+        if line.strip().startswith('text {') and \
+                lines[i+1].strip().startswith('font-family'): #}
+            new += 'display: none;\n'
+    return new
+
+
+def ocr_pages(
+    pages: list[tuple[Path, Path, str, list[float] | None]],
+    api_key: str,
+    ocr_options: OCRImageOptions,
+    ocr_cache: OCRCache | None = None,
+    cache_only: bool = False,
+    ocr_budget: OCRBudget | None = None
+) -> list[str | None]:
+    """
+    OCR converted .rm pages, taking results from the shared cache where possible.
+
+    :param pages: List of (rm output PDF, path to save the OCR result, rm_hash,
+                  render_dims)
+    :param api_key: Google Cloud Vision API key
+    :param ocr_options: How pages are rasterised for OCR
+    :param ocr_cache: Shared OCR cache, or None
+    :param cache_only: Only use cached results, never calling GCV
+    :param ocr_budget: Limits on GCV usage, or None for no limits
+    :returns: For each page, 'cached' or 'scanned' if its OCR result was saved,
+              'deferred' if it was over the OCR budget, or None if it still
+              needs OCR for any other reason
+    """
+    outcomes: list[str | None] = [None] * len(pages)
+    to_scan = []
+    for i, (out_pdf, ocr_file_path, rm_hash, render_dims) in enumerate(pages):
+        cache_key = OCRCache.key(rm_hash, render_dims, ocr_options)
+        if ocr_cache and ocr_cache.get(cache_key, ocr_file_path):
+            log.debug(f"Using cached OCR for {out_pdf.name}")
+            outcomes[i] = 'cached'
+        elif not cache_only:
+            to_scan.append((i, cache_key))
+
+    if to_scan and ocr_budget:
+        allowed = ocr_budget.reserve(len(to_scan))
+        if allowed < len(to_scan):
+            log.info(f"OCR budget reached, deferring {len(to_scan) - allowed} pages")
+            for i, _ in to_scan[allowed:]:
+                outcomes[i] = 'deferred'
+            to_scan = to_scan[:allowed]
+
+    if to_scan:
+        try:
+            ocr_results = run_ocr_on_rm_outputs([
+                (pages[i][0], pages[i][1], pages[i][2]) for i, _ in to_scan
+            ], api_key, ocr_options,
+                ocr_budget.requests_per_minute if ocr_budget else GCV_REQUESTS_PER_MINUTE)
+        except Exception:
+            if ocr_budget:
+                ocr_budget.release(len(to_scan))
+            raise
+        for (i, cache_key), ocr_result in zip(to_scan, ocr_results):
+            if ocr_result:
+                outcomes[i] = 'scanned'
+                if ocr_cache:
+                    ocr_cache.put(cache_key, pages[i][1])
+        # Failed pages are retried later, so shouldn't use up the budget now
+        failed = sum(1 for ocr_result in ocr_results if not ocr_result)
+        if ocr_budget and failed:
+            ocr_budget.release(failed)
+
+    return outcomes
 
-    try:
-        chrome_svg_to_pdf(temp_svg_path, pdf_path)
-    finally:
-        Path(temp_svg_path).unlink(missing_ok=True)
 
 def build_rm_file_index(
     rm_file_dir: Path,
@@ -186,9 +571,14 @@ def build_rm_file_index(
     pages: list[str],
     content: dict,
     backing_pdf_file: Path | None,
+    rm_hashes: dict[str, str],
     api_key: str | None = None,
-    old_rm_files: list[dict] | None = None
-) -> tuple[list[dict], int]:
+    old_rm_files: list[dict] | None = None,
+    ocr_options: OCRImageOptions | None = None,
+    ocr_cache: OCRCache | None = None,
+    defer_ocr: bool = False,
+    ocr_budget: OCRBudget | None = None
+) -> tuple[list[dict], dict]:
     '''
     Build index of .rm files with their page mappings and convert to PDF.
 
@@ -198,15 +588,32 @@ def build_rm_file_index(
     :param pages: Ordered list of page IDs
     :param content: Parsed .content dict
     :param backing_pdf_file: Path to backing PDF, or None
+    :param rm_hashes: Mapping of page ID -> rm_hash, from get_rm_hashes()
     :param api_key: Google Cloud Vision API key for OCR
-    :param old_rm_files: Previous rm_files metadata for OCR caching
-    :returns: Tuple of (list of dicts with page_id, path, index, backing_pdf_index, ocr_path; new OCR scan count)
+    :param old_rm_files: Previous rm_files metadata for render and OCR caching
+    :param ocr_options: How pages are rasterised for OCR
+    :param ocr_cache: Shared OCR cache to check before calling GCV
+    :param defer_ocr: Mark pages needing OCR as ocr_pending instead of calling GCV
+    :param ocr_budget: Limits on GCV usage; pages over it are left ocr_pending
+    :returns: Tuple of (list of dicts with page_id, path, index, backing_pdf_index,
+              ocr_path, ocr_skipped, ocr_pending; stats dict with ocr_scans,
+              ocr_skipped, ocr_cache_hits, ocr_queued, ocr_deferred, pages_rendered, render_cache_hits, render_seconds, max_render_seconds)
     '''
     rm_files = []
-    new_ocr_count = 0
+    stats = {
+        'ocr_scans': 0,
+        'ocr_skipped': 0,
+        'ocr_cache_hits': 0,
+        'ocr_queued': 0,
+        'ocr_deferred': 0,
+        'pages_rendered': 0,
+        'render_cache_hits': 0,
+        'render_seconds': 0.0,
+        'max_render_seconds': 0.0
+    }
     redir_map = get_page_redir_map(content)
 
-    # Build lookup of old page data by page_id for OCR caching
+    # Build lookup of old page data by page_id for render and OCR caching
     old_pages_by_id = {}
     if old_rm_files:
         for old_page in old_rm_files:
@@ -219,6 +626,8 @@ def build_rm_file_index(
     if backing_pdf_file and backing_pdf_file.exists():
         backing_pdf_doc = fitz.open(backing_pdf_file)
 
+    # First pass: work out each page's render dimensions
+    page_entries = []
     for f in rm_file_dir.rglob('*.rm'):
         page_id = f.stem
         if page_id not in pages:
@@ -227,119 +636,390 @@ def build_rm_file_index(
         page_index = pages.index(page_id)
         backing_pdf_index = redir_map.get(page_id)
 
-        # Set dimensions based on backing PDF page or device default
+        # Dimensions from backing PDF page, or None for the device default
+        render_dims = None
         if backing_pdf_doc and backing_pdf_index is not None:
             page = backing_pdf_doc[backing_pdf_index]
-            w_pt, h_pt = page.rect.width, page.rect.height
-            set_dimensions_for_pdf(w_pt, h_pt)
-        else:
-            set_device('RMPP')
-
-        # Convert .rm to PDF
-        fname = page_id
-        rm_output_pdf = rm_output_dir / f'{fname}.pdf'
-        rm_to_pdf_no_text(str(f), str(rm_output_pdf))
+            render_dims = [page.rect.width, page.rect.height]
 
-        rm_hash = hashlib.md5(f.read_bytes()).hexdigest()
+        rm_hash = rm_hashes[page_id]
+        out_pdf = rm_output_dir / f'{page_id}.pdf'
 
-        # Check if we can reuse old OCR
+        # Reuse the previous render if the strokes and page size are unchanged
         old_page = old_pages_by_id.get(page_id)
-        can_reuse_ocr = False
-        if old_page:
-            old_rm_hash = old_page.get('rm_hash', '')
-            old_backing_idx = old_page.get('backing_pdf_index')
-            if old_rm_hash == rm_hash and old_backing_idx == backing_pdf_index:
-                can_reuse_ocr = True
-
-        # Run OCR if API key is available
-        ocr_path = None
-        if api_key:
-            if can_reuse_ocr and old_page.get('ocr_path'):
-                # Reuse old OCR file path directly (file already exists)
-                old_ocr_full_path = base_output_dir / old_page['ocr_path']
-                if old_ocr_full_path.exists():
-                    ocr_path = old_page['ocr_path']
-                    log.debug(f"Reusing OCR for page {page_id}")
-
-            if not ocr_path:
-                # Run fresh OCR
-                ocr_json_path = rm_output_dir / f'{fname}.ocr.json'
-                ocr_result = run_ocr_on_rm_output(
-                    rm_output_pdf, ocr_json_path, api_key, rm_hash, dpi=600
-                )
-                if ocr_result:
-                    ocr_path = str(ocr_json_path.relative_to(base_output_dir))
-                    new_ocr_count += 1
+        render_cached = (
+            old_page is not None
+            and old_page.get('rm_hash') == rm_hash
+            and 'render_dims' in old_page
+            and old_page['render_dims'] == render_dims
+            and out_pdf.exists()
+        )
 
-        rm_files.append({
+        page_entries.append({
+            'rm_path': f,
             'page_id': page_id,
-            'rm_path': str(f.relative_to(base_output_dir)),
-            'rm_hash': rm_hash,
-            'out_path': str(rm_output_pdf.relative_to(base_output_dir)),
             'index': page_index,
             'backing_pdf_index': backing_pdf_index,
-            'ocr_path': ocr_path
+            'rm_hash': rm_hash,
+            'render_dims': render_dims,
+            'render_cached': render_cached,
+            'out_pdf': out_pdf
+        })
+
+    # Convert changed .rm files to PDF, handing the renderer a batch of pages at a time
+    to_render = [entry for entry in page_entries if not entry['render_cached']]
+    stats['render_cache_hits'] = len(page_entries) - len(to_render)
+    for start in range(0, len(to_render), RENDER_BATCH_SIZE):
+        batch = to_render[start:start + RENDER_BATCH_SIZE]
+        svgs = []
+        for entry in batch:
+            if entry['render_dims']:
+                set_dimensions_for_pdf(*entry['render_dims'])
+            else:
+                set_device('RMPP')
+            svgs.append(rm_to_svg_no_text(entry['rm_path']))
+
+        render_timings = render_svgs_to_pdfs(svgs, [entry['out_pdf'] for entry in batch])
+        for entry, render_seconds in zip(batch, render_timings):
+            log.debug(f"Rendered page {entry['page_id']} in {render_seconds * 1000:.0f} ms")
+            stats['pages_rendered'] += 1
+            stats['render_seconds'] += render_seconds
+            stats['max_render_seconds'] = max(stats['max_render_seconds'], render_seconds)
+
+    # Reuse previous OCR where the page is unchanged or the shared cache has it;
+    # collect the rest to send in batches
+    ocr_options = ocr_options or OCRImageOptions()
+    ocr_jobs = []
+    for entry in page_entries:
+        entry['ocr_path'] = None
+        entry['ocr_skipped'] = False
+        if not api_key:
+            continue
+
+        old_page = old_pages_by_id.get(entry['page_id'])
+        unchanged = (
+            old_page is not None
+            and old_page.get('rm_hash', '') == entry['rm_hash']
+            and old_page.get('backing_pdf_index') == entry['backing_pdf_index']
+        )
+        if (unchanged
+                and old_page.get('ocr_path')
+                and (base_output_dir / old_page['ocr_path']).exists()):
+            # Reuse old OCR file path directly (file already exists)
+            entry['ocr_path'] = old_page['ocr_path']
+            log.debug(f"Reusing OCR for page {entry['page_id']}")
+        elif unchanged and old_page.get('ocr_skipped'):
+            entry['ocr_skipped'] = True
+        elif is_blank_page(entry['out_pdf']):
+            # Nothing worth recognising; remember that so it's never sent
+            log.debug(f"Skipping OCR for blank page {entry['page_id']}")
+            entry['ocr_skipped'] = True
+            stats['ocr_skipped'] += 1
+        else:
+            ocr_jobs.append(entry)
+
+    if ocr_jobs:
+        outcomes = ocr_pages([
+            (entry['out_pdf'], rm_output_dir / f"{entry['page_id']}{OCR_SUFFIX}",
+             entry['rm_hash'], entry['render_dims'])
+            for entry in ocr_jobs
+        ], api_key, ocr_options, ocr_cache, cache_only=defer_ocr, ocr_budget=ocr_budget)
+        for entry, outcome in zip(ocr_jobs, outcomes):
+            if outcome in (None, 'deferred'):
+                # Deferred, over budget or GCV failed; left for process_ocr_queue()
+                entry['ocr_pending'] = True
+                stats['ocr_deferred' if outcome else 'ocr_queued'] += 1
+                continue
+            ocr_file_path = rm_output_dir / f"{entry['page_id']}{OCR_SUFFIX}"
+            entry['ocr_path'] = str(ocr_file_path.relative_to(base_output_dir))
+            if outcome == 'cached':
+                stats['ocr_cache_hits'] += 1
+            else:
+                stats['ocr_scans'] += 1
+
+    for entry in page_entries:
+        rm_files.append({
+            'page_id': entry['page_id'],
+            'rm_path': str(entry['rm_path'].relative_to(base_output_dir)),
+            'rm_hash': entry['rm_hash'],
+            'out_path': str(entry['out_pdf'].relative_to(base_output_dir)),
+            'render_dims': entry['render_dims'],
+            'index': entry['index'],
+            'backing_pdf_index': entry['backing_pdf_index'],
+            'ocr_path': entry['ocr_path'],
+            'ocr_skipped': entry['ocr_skipped'],
+            'ocr_pending': entry.get('ocr_pending', False)
         })
 
     if backing_pdf_doc:
         backing_pdf_doc.close()
 
-    return rm_files, new_ocr_count
+    return rm_files, stats
 
 
 def build_page_index(
-    rm_file_dir: Path | None,
     pages: list[str],
-    content: dict
+    content: dict,
+    rm_hashes: dict[str, str],
+    highlight_hashes: dict[str, str] | None = None
 ) -> list[dict]:
     """Build index of ALL pages with their cache keys.
 
+    :param rm_hashes: Mapping of page ID -> rm_hash for pages with .rm files
+    :param highlight_hashes: Mapping of page ID -> highlights_hash for pages
+                             with highlights
+
     Returns list of dicts with:
         - page_id: str
         - index: int
         - backing_pdf_index: int | None
         - rm_hash: str | None
+        - highlights_hash: str | None
     """
+    highlight_hashes = highlight_hashes or {}
     redir_map = get_page_redir_map(content)
 
-    # Build set of page IDs that have .rm files
-    rm_hashes = {}
-    if rm_file_dir and rm_file_dir.exists():
-        for f in rm_file_dir.rglob('*.rm'):
-            page_id = f.stem
-            rm_hashes[page_id] = hashlib.md5(f.read_bytes()).hexdigest()
-
     page_index = []
     for idx, page_id in enumerate(pages):
         page_index.append({
             'page_id': page_id,
             'index': idx,
             'backing_pdf_index': redir_map.get(page_id),
-            'rm_hash': rm_hashes.get(page_id)
+            'rm_hash': rm_hashes.get(page_id),
+            'highlights_hash': highlight_hashes.get(page_id)
         })
 
     return page_index
 
 
-def generate_thumbnails(
-    output_pdf: Path,
+def get_page_template(content: dict, page_id: str) -> str | None:
+    """Get the template name set on a page in cPages, if any."""
+    for page in content.get('cPages', {}).get('pages', []):
+        if page['id'] == page_id:
+            return page.get('template', {}).get('value')
+    return None
+
+
+def compute_layout_hash(id: str, content: dict, file_hashes: dict[str, str]) -> str:
+    """Hash the inputs that affect how every page of a document renders.
+
+    Covers the backing PDF/EPUB, .pagedata and the .content fields that aren't
+    per-page or device bookkeeping. If this changes, no page of a previous
+    remarks output can be reused.
+
+    :param file_hashes: File digests from compute_source_hash()
+    """
+    h = xxhash.xxh3_64()
+    layout = {k: v for k, v in content.items() if k not in CONTENT_BOOKKEEPING_KEYS}
+    h.update(json.dumps(layout, sort_keys=True).encode())
+    for suffix in ('.pdf', '.epub', '.pagedata'):
+        digest = file_hashes.get(f'{id}{suffix}')
+        if digest:
+            h.update(f'{suffix}:{digest}'.encode())
+    return h.hexdigest()
+
+
+def build_assembly_pages(page_index: list[dict], content: dict) -> list[list]:
+    """Build the per-page cache keys of a remarks output, in page order.
+
+    A page of a previous output can be reused wherever a page with the same
+    key appears in the new output, regardless of its position.
+    """
+    pages = []
+    for p in page_index:
+        key = [
+            p['page_id'],
+            p['backing_pdf_index'],
+            p['rm_hash'],
+            get_page_template(content, p['page_id'])
+        ]
+        # Only added for highlighted pages, so keys of other pages stay valid
+        # across upgrades
+        if p.get('highlights_hash'):
+            key.append(p['highlights_hash'])
+        pages.append(key)
+    return pages
+
+
+def run_remarks_to_pdf(xochitl_dir: Path, name: str, dest_pdf: Path):
+    """Run remarks on a xochitl directory and copy its PDF output to dest_pdf."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        remarks_out = Path(tmp_dir) / 'remarks_out'
+        with pooled_chrome_svg_to_pdf():
+            run_remarks(xochitl_dir, remarks_out)
+        expected_pdf = remarks_out / f'{name} _remarks.pdf'
+        if not expected_pdf.exists():
+            raise RuntimeError(f'Remarks produced no output for item "{name}"')
+        shutil.copy2(expected_pdf, dest_pdf)
+
+
+def make_partial_xochitl_dir(
+    id: str,
+    xochitl_dir: Path,
+    partial_dir: Path,
+    content: dict,
+    page_ids: list[str]
+) -> bool:
+    """Create a xochitl directory for a document with only the given pages.
+
+    Everything except .content and the .rm directory is symlinked, so the
+    backing PDF is not copied. Returns False if the document's page format
+    can't be trimmed safely (old-format PDFs map pages to the backing PDF by
+    position).
+    """
+    keep = set(page_ids)
+    trimmed = dict(content)
+    if 'cPages' in content:
+        trimmed['cPages'] = dict(content['cPages'])
+        trimmed['cPages']['pages'] = [
+            page for page in content['cPages']['pages'] if page['id'] in keep
+        ]
+    elif 'pages' in content and not (xochitl_dir / f'{id}.pdf').exists():
+        trimmed['pages'] = [page for page in content['pages'] if page in keep]
+    else:
+        return False
+
+    partial_dir.mkdir(parents=True)
+    for f in xochitl_dir.iterdir():
+        if f.name == f'{id}.content':
+            with open(partial_dir / f.name, 'w') as out:
+                json.dump(trimmed, out)
+        elif f.name == id and f.is_dir():
+            (partial_dir / id).mkdir()
+            for rm in f.iterdir():
+                if rm.stem in keep:
+                    (partial_dir / id / rm.name).symlink_to(rm.resolve())
+        else:
+            (partial_dir / f.name).symlink_to(f.resolve())
+    return True
+
+
+def assemble_output_pdf(
+    id: str,
+    name: str,
+    xochitl_dir: Path,
+    assembly_dir: Path,
+    content: dict,
+    assembly_pages: list[list],
+    layout_hash: str,
+    old_assembly: dict | None
+) -> Path:
+    """Produce the composited (pre-OCR) remarks PDF for a document.
+
+    The previous composited output is kept in assembly_dir. If the document's
+    layout is unchanged, only pages whose keys are new are run through
+    remarks, and the result is spliced together with the reused pages in the
+    new page order. This handles page edits, insertions, deletions and
+    reordering. Otherwise remarks is run over the whole document.
+
+    :param assembly_pages: Page keys from build_assembly_pages()
+    :param layout_hash: Hash from compute_layout_hash()
+    :param old_assembly: Previous 'assembly' metadata for this item
+    :returns: Path to the composited PDF
+    """
+    assembly_dir.mkdir(exist_ok=True)
+    composited_pdf = assembly_dir / 'remarks.pdf'
+
+    old_pages = old_assembly.get('pages', []) if old_assembly else []
+    can_splice = (
+        old_assembly is not None
+        and old_assembly.get('layout_hash') == layout_hash
+        and composited_pdf.exists()
+    )
+    if can_splice:
+        with fitz.open(composited_pdf) as old_doc:
+            can_splice = len(old_doc) == len(old_pages)
+
+    old_index_by_key = {tuple(key): i for i, key in enumerate(old_pages)}
+    changed = [key[0] for key in assembly_pages if tuple(key) not in old_index_by_key]
+    if can_splice and len(changed) > len(assembly_pages) * INCREMENTAL_MAX_CHANGED_FRACTION:
+        can_splice = False
+
+    if can_splice:
+        try:
+            if _splice_output_pdf(
+                id, name, xochitl_dir, composited_pdf, content,
+                assembly_pages, old_index_by_key, changed
+            ):
+                log.info(f'Spliced {len(changed)} changed pages into "{name}"')
+                return composited_pdf
+        except Exception as e:
+            log.warning(f'Incremental assembly failed for "{name}", doing full run: {e}')
+
+    run_remarks_to_pdf(xochitl_dir, name, composited_pdf)
+    return composited_pdf
+
+
+def _splice_output_pdf(
+    id: str,
+    name: str,
+    xochitl_dir: Path,
+    composited_pdf: Path,
+    content: dict,
+    assembly_pages: list[list],
+    old_index_by_key: dict[tuple, int],
+    changed: list[str]
+) -> bool:
+    """Rebuild composited_pdf from its old pages plus freshly rendered changed pages.
+
+    :returns: False if the changed pages couldn't be rendered on their own
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        partial_pdf = tmp_path / 'partial.pdf'
+        if changed:
+            if not make_partial_xochitl_dir(
+                id, xochitl_dir, tmp_path / 'xochitl', content, changed
+            ):
+                return False
+            run_remarks_to_pdf(tmp_path / 'xochitl', name, partial_pdf)
+
+        old_doc = fitz.open(composited_pdf)
+        partial_doc = fitz.open(partial_pdf) if changed else None
+        try:
+            if partial_doc is not None and len(partial_doc) != len(changed):
+                log.warning(f'Partial remarks output for "{name}" has '
+                            f'{len(partial_doc)} pages, expected {len(changed)}')
+                return False
+
+            new_doc = fitz.open()
+            partial_idx = 0
+            for key in assembly_pages:
+                old_idx = old_index_by_key.get(tuple(key))
+                if old_idx is not None:
+                    new_doc.insert_pdf(old_doc, from_page=old_idx, to_page=old_idx)
+                else:
+                    new_doc.insert_pdf(partial_doc, from_page=partial_idx, to_page=partial_idx)
+                    partial_idx += 1
+            spliced_pdf = tmp_path / 'spliced.pdf'
+            new_doc.save(spliced_pdf, garbage=3, deflate=True)
+            new_doc.close()
+        finally:
+            old_doc.close()
+            if partial_doc is not None:
+                partial_doc.close()
+
+        shutil.move(spliced_pdf, composited_pdf)
+    return True
+
+
+def resolve_cached_thumbnails(
     thumbnail_dir: Path,
     base_output_dir: Path,
     page_index: list[dict],
     old_thumbnail_pages: list[dict] | None = None
-) -> tuple[list[dict], int]:
-    """Generate thumbnails for all pages with caching support.
+) -> tuple[dict[int, dict], list[dict]]:
+    """Work out which thumbnails can be reused and which need rendering.
+
+    Reusable thumbnails are renamed to their new page number if the page moved.
 
-    :param output_pdf: Path to the final output PDF
     :param thumbnail_dir: Directory to store thumbnails
     :param base_output_dir: Base output directory for relative paths
     :param page_index: List of page metadata from build_page_index()
     :param old_thumbnail_pages: Previous thumbnail_pages metadata for caching
-    :returns: Tuple of (list of thumbnail metadata dicts, count of new thumbnails generated)
+    :returns: Tuple of (thumbnail metadata by page index for every page,
+              list of those metadata dicts that still need rendering)
     """
-    target_width = 384
-    target_height = 512
-
     # Build lookup of old pages by page_id
     old_pages_by_id = {}
     if old_thumbnail_pages:
@@ -348,18 +1028,26 @@ def generate_thumbnails(
             if old_page_id:
                 old_pages_by_id[old_page_id] = old_page
 
-    doc = fitz.open(output_pdf)
-    thumbnail_pages = []
-    new_thumbnails_count = 0
+    thumbnails = {}
+    to_render = []
 
     for page_info in page_index:
         page_id = page_info['page_id']
         page_idx = page_info['index']
         backing_pdf_index = page_info['backing_pdf_index']
         rm_hash = page_info['rm_hash']
+        highlights_hash = page_info.get('highlights_hash')
 
         thumbnail_path = thumbnail_dir / f'{page_idx} - {page_id}.png'
-        thumbnail_rel_path = str(thumbnail_path.relative_to(base_output_dir))
+        thumbnail = {
+            'page_id': page_id,
+            'index': page_idx,
+            'backing_pdf_index': backing_pdf_index,
+            'rm_hash': rm_hash,
+            'highlights_hash': highlights_hash,
+            'thumbnail_path': str(thumbnail_path.relative_to(base_output_dir))
+        }
+        thumbnails[page_idx] = thumbnail
 
         # Check if cache is valid - search by UUID to handle page reordering
         old_page = old_pages_by_id.get(page_id)
@@ -370,8 +1058,9 @@ def generate_thumbnails(
         if old_page and existing_thumbnail:
             old_backing_idx = old_page.get('backing_pdf_index')
             old_rm_hash = old_page.get('rm_hash')
-            # Cache valid if both backing_pdf_index AND rm_hash match
-            if old_backing_idx == backing_pdf_index and old_rm_hash == rm_hash:
+            # Cache valid if backing_pdf_index, rm_hash and highlights all match
+            if (old_backing_idx == backing_pdf_index and old_rm_hash == rm_hash
+                    and old_page.get('highlights_hash') == highlights_hash):
                 # Special case: inserted blank page (None, None) - always regenerate
                 if backing_pdf_index is None and rm_hash is None:
                     can_reuse = False
@@ -384,187 +1073,159 @@ def generate_thumbnails(
 
         if can_reuse:
             log.debug(f"Reusing thumbnail for page {page_idx}")
-            thumbnail_pages.append({
-                'page_id': page_id,
-                'index': page_idx,
-                'backing_pdf_index': backing_pdf_index,
-                'rm_hash': rm_hash,
-                'thumbnail_path': thumbnail_rel_path
-            })
-            continue
+        else:
+            to_render.append(thumbnail)
 
-        # Render new thumbnail
-        if page_idx >= len(doc):
-            log.warning(f"Page index {page_idx} out of range for {output_pdf}")
-            continue
+    return thumbnails, to_render
 
-        page = doc[page_idx]
-        page_rect = page.rect
 
-        if backing_pdf_index is not None:
-            # PDF-backed page: fit entire page within thumbnail, centered
-            zoom = min(target_width / page_rect.width, target_height / page_rect.height)
-            matrix = fitz.Matrix(zoom, zoom)
+def render_thumbnail(
+    page: fitz.Page,
+    thumbnail_path: Path,
+    backing_pdf_index: int | None,
+    target_width: int = 384,
+    target_height: int = 512
+):
+    """Render a single page thumbnail.
+
+    :param page: Page of the final output PDF
+    :param thumbnail_path: Path to write the PNG to
+    :param backing_pdf_index: Backing PDF page index, or None for notebook pages
+    :param target_width: Thumbnail width in pixels
+    :param target_height: Thumbnail height in pixels
+    """
+    page_rect = page.rect
+
+    if backing_pdf_index is not None:
+        # PDF-backed page: fit entire page within thumbnail, centered
+        zoom = min(target_width / page_rect.width, target_height / page_rect.height)
+        matrix = fitz.Matrix(zoom, zoom)
+        pix = page.get_pixmap(matrix=matrix)
+        thumb = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, target_width, target_height), 0)
+        thumb.set_rect(thumb.irect, (255, 255, 255))
+        x_offset = (target_width - pix.width) // 2
+        y_offset = (target_height - pix.height) // 2
+        pix.set_origin(x_offset, y_offset)
+        thumb.copy(pix, pix.irect)
+        thumb.save(thumbnail_path)
+    else:
+        # No backing PDF: fill width, crop from top if tall
+        zoom = target_width / page_rect.width
+        matrix = fitz.Matrix(zoom, zoom)
+        scaled_height = int(page_rect.height * zoom)
+
+        if scaled_height >= target_height:
+            clip = fitz.IRect(0, 0, target_width, target_height)
+            pix = page.get_pixmap(matrix=matrix, clip=clip)
+            pix.save(thumbnail_path)
+        else:
             pix = page.get_pixmap(matrix=matrix)
             thumb = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, target_width, target_height), 0)
             thumb.set_rect(thumb.irect, (255, 255, 255))
-            x_offset = (target_width - pix.width) // 2
             y_offset = (target_height - pix.height) // 2
-            pix.set_origin(x_offset, y_offset)
+            pix.set_origin(0, y_offset)
             thumb.copy(pix, pix.irect)
             thumb.save(thumbnail_path)
-        else:
-            # No backing PDF: fill width, crop from top if tall
-            zoom = target_width / page_rect.width
-            matrix = fitz.Matrix(zoom, zoom)
-            scaled_height = int(page_rect.height * zoom)
-
-            if scaled_height >= target_height:
-                clip = fitz.IRect(0, 0, target_width, target_height)
-                pix = page.get_pixmap(matrix=matrix, clip=clip)
-                pix.save(thumbnail_path)
-            else:
-                pix = page.get_pixmap(matrix=matrix)
-                thumb = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, target_width, target_height), 0)
-                thumb.set_rect(thumb.irect, (255, 255, 255))
-                y_offset = (target_height - pix.height) // 2
-                pix.set_origin(0, y_offset)
-                thumb.copy(pix, pix.irect)
-                thumb.save(thumbnail_path)
-        new_thumbnails_count += 1
-
-        log.info(f"Generated thumbnail for page {page_idx}: {thumbnail_path.name}")
-
-        thumbnail_pages.append({
-            'page_id': page_id,
-            'index': page_idx,
-            'backing_pdf_index': backing_pdf_index,
-            'rm_hash': rm_hash,
-            'thumbnail_path': thumbnail_rel_path
-        })
-
-    doc.close()
-
-    # Clean up orphaned thumbnails (wrong page number or deleted pages)
-    current_thumbnail_names = {f'{p["index"]} - {p["page_id"]}.png' for p in thumbnail_pages}
-    for f in thumbnail_dir.glob('*.png'):
-        if f.name not in current_thumbnail_names:
-            log.info(f"Removing orphaned thumbnail: {f.name}")
-            f.unlink()
-
-    return thumbnail_pages, new_thumbnails_count
 
 
-def stitch_ocr_text_layers(
+def process_output_pages(
     output_pdf: Path,
     rm_files: list[dict],
     base_output_dir: Path,
+    search_index_path: Path,
+    page_index: list[dict],
+    thumbnail_dir: Path | None = None,
+    old_thumbnail_pages: list[dict] | None = None,
     debug: bool = False
-) -> tuple[int, int]:
+) -> tuple[list[dict], int, int]:
     """
-    Stitch OCR text layers into the final remarks PDF.
+    Build the search index, stitch OCR text layers and generate thumbnails in
+    a single pass over the final output PDF.
 
-    :param output_pdf: Path to the remarks output PDF
+    Each page is handled in order: its backing PDF text is extracted first
+    (so the search index never contains the stitched OCR layer), then the OCR
+    text layer is added, then the thumbnail is rendered if needed.
+
+    :param output_pdf: Path to the final output PDF (before OCR stitching)
     :param rm_files: List of rm file dicts with ocr_path entries
     :param base_output_dir: Base output directory for resolving relative paths
-    :param debug: If True, make text visible for debugging
-    :returns: Tuple of (number of pages with OCR text added, total words added)
+    :param search_index_path: Path to write the search_index.json
+    :param page_index: List of page metadata from build_page_index()
+    :param thumbnail_dir: Directory to store thumbnails, or None to skip thumbnails
+    :param old_thumbnail_pages: Previous thumbnail_pages metadata for caching
+    :param debug: If True, make OCR text visible for debugging
+    :returns: Tuple of (list of thumbnail metadata dicts, count of new
+              thumbnails generated, total OCR words added)
     """
-    doc = fitz.open(output_pdf)
-    pages_with_ocr = 0
-    total_words = 0
+    thumbnails = {}
+    to_render = {}
+    if thumbnail_dir is not None:
+        thumbnails, pending = resolve_cached_thumbnails(
+            thumbnail_dir, base_output_dir, page_index, old_thumbnail_pages
+        )
+        to_render = {t['index']: t for t in pending}
 
+    ocr_paths = {}
     for rm_file in rm_files:
-        ocr_rel_path = rm_file.get('ocr_path')
-        if not ocr_rel_path:
-            continue
-
-        page_index = rm_file['index']
-        if page_index >= len(doc):
-            log.warning(f"Page index {page_index} out of range for {output_pdf}")
-            continue
-
-        page = doc[page_index]
-
-        ocr_path = base_output_dir / ocr_rel_path
-        if not ocr_path.exists():
-            log.warning(f"OCR file not found: {ocr_path}")
-            continue
-
-        try:
-            with open(ocr_path) as f:
-                ocr_result = json.load(f)
-
-            words_added = add_text_layer_to_page(
-                page, ocr_result, page.rect.width, page.rect.height, debug=debug
-            )
-
-            if words_added > 0:
-                pages_with_ocr += 1
-                total_words += words_added
-                log.debug(f"Added {words_added} words to page {page_index}")
-
-        except Exception as e:
-            log.warning(f"Failed to add OCR layer for page {page_index}: {e}")
-
-    doc.save(output_pdf, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
-    doc.close()
-
-    return pages_with_ocr, total_words
-
-
-def build_search_index(
-    output_pdf: Path,
-    rm_files: list[dict],
-    base_output_dir: Path,
-    search_index_path: Path
-) -> None:
-    """
-    Build a search index JSON file with backing PDF text and OCR text per page.
-
-    Must be called BEFORE stitch_ocr_text_layers() so that page.get_text()
-    returns only the original backing PDF text, not the stitched OCR layer.
+        if rm_file.get('ocr_path'):
+            ocr_paths[rm_file['index']] = base_output_dir / rm_file['ocr_path']
 
-    :param output_pdf: Path to the remarks output PDF (before OCR stitching)
-    :param rm_files: List of rm file dicts with ocr_path entries
-    :param base_output_dir: Base output directory for resolving relative paths
-    :param search_index_path: Path to write the search_index.json
-    """
     backing_pages = {}
     ocr_pages = {}
+    total_words = 0
+    new_thumbnails_count = 0
 
-    # Extract text from backing PDF pages
     doc = fitz.open(output_pdf)
-    for i in range(len(doc)):
-        text = doc[i].get_text().strip()
+    for i, page in enumerate(doc):
+        # Extract backing PDF text before anything is stitched in
+        text = page.get_text().strip()
         if text:
             backing_pages[str(i + 1)] = text
-    doc.close()
 
-    # Extract OCR text from .ocr.json files
-    for rm_file in rm_files:
-        ocr_rel_path = rm_file.get('ocr_path')
-        if not ocr_rel_path:
-            continue
+        ocr_path = ocr_paths.pop(i, None)
+        if ocr_path is not None:
+            if not ocr_path.exists():
+                log.warning(f"OCR file not found: {ocr_path}")
+            else:
+                try:
+                    ocr_result = load_ocr_result(ocr_path)
+
+                    full_text = get_ocr_full_text(ocr_result)
+                    if full_text:
+                        ocr_pages[str(i + 1)] = full_text
+
+                    words_added = add_text_layer_to_page(
+                        page, ocr_result, page.rect.width, page.rect.height, debug=debug
+                    )
+                    if words_added > 0:
+                        total_words += words_added
+                        log.debug(f"Added {words_added} words to page {i}")
+
+                except Exception as e:
+                    log.warning(f"Failed to add OCR layer for page {i}: {e}")
+
+        thumbnail = to_render.pop(i, None)
+        if thumbnail is not None:
+            thumbnail_path = base_output_dir / thumbnail['thumbnail_path']
+            render_thumbnail(page, thumbnail_path, thumbnail['backing_pdf_index'])
+            new_thumbnails_count += 1
+            log.info(f"Generated thumbnail for page {i}: {thumbnail_path.name}")
 
-        ocr_path = base_output_dir / ocr_rel_path
-        if not ocr_path.exists():
-            continue
+    if rm_files:
+        doc.save(output_pdf, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    doc.close()
 
-        try:
-            with open(ocr_path) as f:
-                ocr_result = json.load(f)
-
-            gcv_response = ocr_result.get('gcv_response', {})
-            responses = gcv_response.get('responses', [{}])
-            text_annotations = responses[0].get('textAnnotations', [])
-            if text_annotations:
-                full_text = text_annotations[0].get('description', '').strip()
-                if full_text:
-                    page_num = str(rm_file['index'] + 1)
-                    ocr_pages[page_num] = full_text
-        except Exception as e:
-            log.warning(f"Failed to read OCR for search index: {e}")
+    # Anything left over points past the end of the document
+    for page_idx in list(ocr_paths) + list(to_render):
+        log.warning(f"Page index {page_idx} out of range for {output_pdf}")
+    for page_idx in to_render:
+        del thumbnails[page_idx]
+
+    # Keep OCR pages in rm_files order, as the search index has always listed them
+    ocr_pages = {
+        str(rm_file['index'] + 1): ocr_pages[str(rm_file['index'] + 1)]
+        for rm_file in rm_files if str(rm_file['index'] + 1) in ocr_pages
+    }
 
     index = {}
     if backing_pages:
@@ -572,11 +1233,23 @@ def build_search_index(
     if ocr_pages:
         index['ocr_pages'] = ocr_pages
 
-    with open(search_index_path, 'w') as f:
-        json.dump(index, f, indent=2)
+    # Atomic, as the OCR worker rewrites it while the viewer may be reading it
+    write_json_atomic(search_index_path, index, indent=2)
 
     log.info(f"Created search index: {len(backing_pages)} backing pages, {len(ocr_pages)} OCR pages")
 
+    thumbnail_pages = [thumbnails[p['index']] for p in page_index if p['index'] in thumbnails]
+
+    # Clean up orphaned thumbnails (wrong page number or deleted pages)
+    if thumbnail_dir is not None:
+        current_thumbnail_names = {f'{p["index"]} - {p["page_id"]}.png' for p in thumbnail_pages}
+        for f in thumbnail_dir.glob('*.png'):
+            if f.name not in current_thumbnail_names:
+                log.info(f"Removing orphaned thumbnail: {f.name}")
+                f.unlink()
+
+    return thumbnail_pages, new_thumbnails_count, total_words
+
 
 def parse_item(
     id: str,
@@ -585,7 +1258,11 @@ def parse_item(
     old_item: dict | None,
     api_key: str | None = None,
     ocr_debug: bool = False,
-    no_thumbnails: bool = False
+    no_thumbnails: bool = False,
+    ocr_options: OCRImageOptions | None = None,
+    ocr_cache: OCRCache | None = None,
+    defer_ocr: bool = False,
+    ocr_budget: OCRBudget | None = None
 ) -> tuple[dict, str, dict]:
     '''
     Given item ID and xochitl files, generate output folder containing
@@ -596,9 +1273,15 @@ def parse_item(
     :param files: xochitl files corresponding to item
     :param old_item: Existing metadata for this specific item (if any)
     :param output_dir: directory to put output
+    :param defer_ocr: Leave pages needing OCR to the background OCR queue
+    :param ocr_budget: Limits on GCV usage; pages over it are queued for later
     :returns: tuple of (metadata dict, status string, stats dict)
-              status is one of: 'created', 'modified', 'unchanged', 'skipped'
-              stats contains: thumbnails_generated, ocr_scans, words_recognized
+              status is one of: 'created', 'modified', 'metadata' (only
+              bookkeeping changed), 'unchanged', 'skipped'
+              stats contains: thumbnails_generated, ocr_scans, ocr_skipped, ocr_cache_hits,
+              ocr_queued, ocr_deferred, words_recognized,
+              pages_rendered, render_cache_hits, render_seconds, max_render_seconds,
+              chrome_pages, chrome_seconds, chrome_max_seconds, chrome_restarts
     '''
     # Get metadata and content
     metadata = {}
@@ -654,9 +1337,20 @@ def parse_item(
 
     nb_output_dir = output_dir / f'{name} - {id}'
     cached_dir_exists = nb_output_dir.exists()
+    pool_stats_before = render_pool_stats()
 
     # For books: compute source hash and check against old
-    source_hash = compute_source_hash(id, files)
+    source_hash, file_hashes = compute_source_hash(id, files)
+    rm_hashes = get_rm_hashes(id, file_hashes)
+    highlight_hashes = get_highlight_hashes(id, file_hashes)
+    render_hash = compute_render_hash(id, file_hashes)
+
+    # Build page index (cache keys for assembly and thumbnails)
+    page_index = build_page_index(pages, content, rm_hashes, highlight_hashes)
+    assembly = {
+        'layout_hash': compute_layout_hash(id, content, file_hashes),
+        'pages': build_assembly_pages(page_index, content)
+    }
 
     if old_item and old_item.get('type') == 'book':
         old_hash = old_item.get('xochitl_dir_hash', '')
@@ -669,6 +1363,8 @@ def parse_item(
             if old_dir.exists():
                 log.info(f'Renaming "{old_name}" to "{name}"')
                 old_dir.rename(new_dir)
+                cached_dir_exists = True
+                old_item = rebase_item_paths(old_item, old_dir.name, new_dir.name)
 
         # If hash unchanged, return old metadata (with updated name/parent)
         if source_hash == old_hash and cached_dir_exists:
@@ -678,16 +1374,45 @@ def parse_item(
             result['parent'] = parent
             return result, 'unchanged', {}
 
+        # Only bookkeeping changed (e.g. the notebook was opened, renamed or
+        # moved): restage .metadata/.content and update the item's metadata
+        old_output_pdf = output_dir / old_item.get('output_pdf', '')
+        if (cached_dir_exists
+                and old_item.get('render_hash') == render_hash
+                and old_item.get('assembly') == assembly
+                and old_output_pdf.is_file()):
+            log.info(f'Metadata only: {name}')
+            nb_xochitl_dir = output_dir / old_item['xochitl_dir']
+            for file in files:
+                if file.name in (f'{id}.metadata', f'{id}.content'):
+                    restage_file(file, nb_xochitl_dir / file.name)
+
+            result = old_item.copy()
+            output_pdf = nb_output_dir / f'{name}.pdf'
+            if old_output_pdf != output_pdf:
+                os.replace(old_output_pdf, output_pdf)
+                result['output_pdf'] = str(output_pdf.relative_to(output_dir))
+            result.update({
+                'name': name,
+                'parent': parent,
+                'xochitl_dir_hash': source_hash,
+                'last_opened_page': last_opened_page,
+                'cover_page_number': cover_page_number,
+                'total_pages': len(pages)
+            })
+            return result, 'metadata', {}
+
     # Hash changed or new item - do full processing
     log.info(f'Processing item: {name}')
 
     # Get old rm_files for OCR caching (before we modify anything)
     old_rm_files = old_item.get('rm_files', []) if old_item else []
 
-    # Delete directories EXCEPT rm_output (needed for OCR cache) and thumbnails (for thumbnail cache)
+    # Delete directories EXCEPT rm_output (needed for OCR cache), thumbnails (for
+    # thumbnail cache) and assembly (previous composited output for splicing)
     if nb_output_dir.exists():
         for child in nb_output_dir.iterdir():
-            if child.name not in ('rm_output', 'thumbnails'):
+            if child.name not in ('rm_output', 'thumbnails', 'assembly'):
                 if child.is_dir():
                     shutil.rmtree(child)
                 else:
@@ -702,26 +1427,16 @@ def parse_item(
     nb_thumbnail_dir.mkdir(exist_ok=True)
     nb_rm_output_dir.mkdir(exist_ok=True)
 
-    # Copy xochitl files into nb_xochitl_dir
+    # Stage xochitl files into nb_xochitl_dir (reflinked/hardlinked where possible)
     rm_file_dir = None
     for file in files:
         if file.is_dir():
             cpdir = nb_xochitl_dir / file.name
-            shutil.copytree(file, cpdir)
+            stage_tree(file, cpdir)
             if file.name == id:
                 rm_file_dir = cpdir
         else:
-            shutil.copy(file, nb_xochitl_dir)
-
-    # Run remarks in temp directory
-    output_pdf = nb_output_dir / f'{name}.pdf'
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        remarks_out = Path(tmp_dir) / 'remarks_out'
-        run_remarks(nb_xochitl_dir, remarks_out)
-        expected_pdf = remarks_out / f'{name} _remarks.pdf'
-        if not expected_pdf.exists():
-            raise RuntimeError(f'Remarks produced no output for item "{name}"')
-        shutil.copy2(expected_pdf, output_pdf)
+            stage_file(file, nb_xochitl_dir)
 
     # Get backing PDF
     backing_pdf = None
@@ -729,14 +1444,37 @@ def parse_item(
     if backing_pdf_file.exists():
         backing_pdf = backing_pdf_file
 
+    output_pdf = nb_output_dir / f'{name}.pdf'
+    if is_unannotated(id, content, file_hashes, backing_pdf_file):
+        # Nothing for remarks to draw, so publish the backing PDF itself. It
+        # may be hardlinked to the source, so it's never written to: with no
+        # rm_files, process_output_pages() only reads it
+        log.info(f'No annotations, publishing backing PDF: {name}')
+        restage_file(backing_pdf_file, output_pdf)
+        # An old composited PDF must never be spliced into a later run
+        shutil.rmtree(nb_output_dir / 'assembly', ignore_errors=True)
+    else:
+        # Assemble the composited PDF, rerunning remarks only on changed pages
+        old_assembly = old_item.get('assembly') if old_item else None
+        composited_pdf = assemble_output_pdf(
+            id, name, nb_xochitl_dir, nb_output_dir / 'assembly', content,
+            assembly['pages'], assembly['layout_hash'], old_assembly
+        )
+        shutil.copy2(composited_pdf, output_pdf)
+
     # Build rm_file index (with OCR if api_key available)
     rm_files = []
-    new_ocr_scans = 0
+    rm_stats = {}
     if rm_file_dir:
-        rm_files, new_ocr_scans = build_rm_file_index(
+        rm_files, rm_stats = build_rm_file_index(
             rm_file_dir, nb_rm_output_dir, output_dir, pages, content, backing_pdf_file,
+            rm_hashes,
             api_key=api_key,
-            old_rm_files=old_rm_files
+            old_rm_files=old_rm_files,
+            ocr_options=ocr_options,
+            ocr_cache=ocr_cache,
+            defer_ocr=defer_ocr,
+            ocr_budget=ocr_budget
         )
 
     # Clean up orphaned OCR files
@@ -745,51 +1483,50 @@ def parse_item(
         if rm_file.get('ocr_path'):
             current_ocr_files.add(Path(rm_file['ocr_path']).name)
 
-    for f in nb_rm_output_dir.glob('*.ocr.json'):
+    ocr_files = [
+        *nb_rm_output_dir.glob(f'*{OCR_SUFFIX}'),
+        *nb_rm_output_dir.glob(f'*{LEGACY_OCR_SUFFIX}')
+    ]
+    for f in ocr_files:
         if f.name not in current_ocr_files:
             log.info(f"Removing orphaned OCR file: {f.name}")
             f.unlink()
 
-    # Build search index (before OCR stitching so page.get_text() returns only backing PDF text)
-    search_index_path = nb_output_dir / 'search_index.json'
-    build_search_index(output_pdf, rm_files, output_dir, search_index_path)
-
-    # Stitch OCR text layers into the final PDF
-    ocr_words = 0
-    if rm_files:
-        _, ocr_words = stitch_ocr_text_layers(output_pdf, rm_files, output_dir, debug=ocr_debug)
-
-    # Build page index for thumbnails
-    page_index = build_page_index(rm_file_dir, pages, content)
-
-    # Generate thumbnails (unless disabled)
-    thumbnail_pages = []
-    new_thumbnails = 0
-    if not no_thumbnails:
-        # Get old thumbnail metadata
-        old_thumbnail_pages = old_item.get('thumbnail_pages', []) if old_item else []
-
-        # Generate thumbnails
-        thumbnail_pages, new_thumbnails = generate_thumbnails(
-            output_pdf,
-            nb_thumbnail_dir,
-            output_dir,
-            page_index,
-            old_thumbnail_pages
-        )
+    # Search index, OCR text layers and thumbnails in one pass over the output PDF
+    old_thumbnail_pages = old_item.get('thumbnail_pages', []) if old_item else []
+    thumbnail_pages, new_thumbnails, ocr_words = process_output_pages(
+        output_pdf,
+        rm_files,
+        output_dir,
+        nb_output_dir / 'search_index.json',
+        page_index,
+        thumbnail_dir=None if no_thumbnails else nb_thumbnail_dir,
+        old_thumbnail_pages=old_thumbnail_pages,
+        debug=ocr_debug
+    )
 
     xochitl_dir = str(nb_xochitl_dir.relative_to(output_dir))
     output_pdf = str(output_pdf.relative_to(output_dir))
     backing_pdf = '' if not backing_pdf else str(backing_pdf.relative_to(output_dir))
     thumbnail_dir = str(nb_thumbnail_dir.relative_to(output_dir))
 
-    xochitl_dir_hash = xx_dir_hash(nb_xochitl_dir)
+    # The copied files are identical to the source, so reuse the source hash
+    xochitl_dir_hash = source_hash
 
     status = 'modified' if old_item and cached_dir_exists else 'created'
     stats = {
         'thumbnails_generated': new_thumbnails,
-        'ocr_scans': new_ocr_scans,
-        'words_recognized': ocr_words
+        'ocr_scans': rm_stats.get('ocr_scans', 0),
+        'ocr_skipped': rm_stats.get('ocr_skipped', 0),
+        'ocr_cache_hits': rm_stats.get('ocr_cache_hits', 0),
+        'ocr_queued': rm_stats.get('ocr_queued', 0),
+        'ocr_deferred': rm_stats.get('ocr_deferred', 0),
+        'words_recognized': ocr_words,
+        'pages_rendered': rm_stats.get('pages_rendered', 0),
+        'render_cache_hits': rm_stats.get('render_cache_hits', 0),
+        'render_seconds': rm_stats.get('render_seconds', 0.0),
+        'max_render_seconds': rm_stats.get('max_render_seconds', 0.0),
+        **chrome_pool_stats_since(pool_stats_before)
     }
     return {
         'type': 'book',
@@ -803,9 +1540,11 @@ def parse_item(
         'thumbnail_dir': thumbnail_dir,
 
         'xochitl_dir_hash': xochitl_dir_hash,
+        'render_hash': render_hash,
 
         'rm_files': rm_files,
         'thumbnail_pages': thumbnail_pages,
+        'assembly': assembly,
 
         'last_opened_page': last_opened_page,
         'cover_page_number': cover_page_number,
@@ -820,14 +1559,124 @@ def try_get_name(files: list[Path]):
                 name = metadata.get('visibleName', '')
                 return name
 
-def run_rm_process(xochitl_dir: Path, output_dir: Path, *, no_ocr=False, ocr_debug=False, no_thumbnails=False):
-    """Core processing logic. Called by both CLI and syncd."""
-    old_metadata = None
-    old_metadata_f = (output_dir / 'metadata.json')
-    if old_metadata_f.exists():
-        with open(old_metadata_f) as f:
-            old_metadata = json.load(f)
+def _init_worker():
+    """Set up logging in pool workers (spawned workers start unconfigured)."""
+    pkg_log = logging.getLogger(__package__)
+    if not pkg_log.handlers:
+        setup_logger(pkg_log)
+    # Workers leave via os._exit, skipping atexit, so close their browsers here
+    Finalize(None, close_render_pool, exitpriority=10)
 
+
+def _parse_item_task(
+    id: str,
+    files: list[Path],
+    output_dir: Path,
+    old_item: dict | None,
+    **kwargs
+) -> tuple[str, tuple | str]:
+    '''
+    Run parse_item, capturing any failure as a formatted traceback.
+
+    Used for both serial and pooled runs so that errors are reported the same
+    way regardless of where the item was processed.
+
+    :returns: ('ok', parse_item result) or ('error', traceback string)
+    '''
+    try:
+        return 'ok', parse_item(id, files, output_dir, old_item, **kwargs)
+    except Exception:
+        return 'error', traceback.format_exc()
+
+
+class _MetadataPublisher:
+    """
+    Publishes items to metadata.json while a run is still going, at most once
+    every `interval` seconds. Items finishing in between are written together
+    by a timer, then on_published is called with their IDs.
+    """
+
+    def __init__(self, metadata_path: Path, items_by_id: dict[str, dict],
+                 on_published: Callable[[list[str]], None], interval: float = PUBLISH_INTERVAL_SECONDS):
+        self.metadata_path = metadata_path
+        self.items_by_id = dict(items_by_id)
+        self.on_published = on_published
+        self.interval = interval
+        self.pending = []
+        self.last_published = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add(self, item: dict):
+        """Queue a finished item, publishing now if the interval has passed."""
+        with self._lock:
+            self.items_by_id[item['id']] = item
+            self.pending.append(item['id'])
+            if self._timer is not None:
+                return
+            delay = 0.0
+            if self.last_published is not None:
+                delay = max(0.0, self.last_published + self.interval - time.monotonic())
+            self._timer = threading.Timer(delay, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            self._timer = None
+            if not self.pending:
+                return
+            write_json_atomic(self.metadata_path, list(self.items_by_id.values()), indent=2)
+            ids, self.pending = self.pending, []
+            self.last_published = time.monotonic()
+            self.on_published(ids)
+
+    def close(self) -> list[str]:
+        """
+        Stop publishing. Items not yet published are left to the final
+        metadata.json write.
+
+        :returns: IDs of the items not yet published
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            ids, self.pending = self.pending, []
+            return ids
+
+
+def run_rm_process(xochitl_dir: Path, output_dir: Path, *, no_ocr=False, ocr_debug=False, no_thumbnails=False, jobs=1,
+                   ocr_options: OCRImageOptions | None = None, ocr_cache_mb: int = 512, defer_ocr=False,
+                   ocr_requests_per_minute: float = GCV_REQUESTS_PER_MINUTE, ocr_max_pages_per_run: int = 0,
+                   ocr_max_pages_per_day: int = 0,
+                   on_items_published: Callable[[list[str]], None] | None = None,
+                   ocr_run_id: str | None = None):
+    """Core processing logic. Called by both CLI and syncd.
+
+    Changed items are processed most recently used first. With jobs > 1,
+    they are parsed in a pool of worker processes. Results are still merged
+    in filemap order, so output matches a serial run. The OCR stats may not:
+    a page shared by items in different workers can be scanned by each
+    before either result reaches the OCR cache.
+
+    With defer_ocr, notebooks are published without waiting on GCV and pages
+    needing OCR are left in the OCR queue for process_ocr_queue(). Otherwise
+    the queue (pages whose OCR failed, or left by earlier deferred runs) is
+    worked through before returning.
+
+    GCV requests are rate limited to ocr_requests_per_minute, and at most
+    ocr_max_pages_per_run / ocr_max_pages_per_day pages are sent (0 for no
+    limit). Pages over budget are queued like deferred ones and picked up
+    by later runs. Pass ocr_run_id to share the per-run count with other
+    budgets using the same run_id (e.g. syncd's OCR thread).
+
+    With on_items_published, changed items are published to metadata.json
+    as they finish (batched to at most one write every
+    PUBLISH_INTERVAL_SECONDS), then on_items_published is called with their
+    IDs. Items left over are published with the final metadata.json, as are
+    deletions and the final item order.
+    """
     # Get GCV API key for OCR
     api_key = None
     if no_ocr:
@@ -841,38 +1690,227 @@ def run_rm_process(xochitl_dir: Path, output_dir: Path, *, no_ocr=False, ocr_deb
         else:
             log.info("No GCV API key found, OCR will be disabled")
 
+    # Shared OCR results, reused across notebooks and output dir rebuilds
+    ocr_cache = None
+    if api_key and ocr_cache_mb > 0:
+        ocr_cache = OCRCache(output_dir / OCR_CACHE_DIR, ocr_cache_mb * 1024 * 1024)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ocr_budget = OCRBudget(
+        output_dir / OCR_USAGE_FILE,
+        max_pages_per_run=ocr_max_pages_per_run,
+        max_pages_per_day=ocr_max_pages_per_day,
+        requests_per_minute=ocr_requests_per_minute,
+        **({'run_id': ocr_run_id} if ocr_run_id else {})
+    )
+
+    # Held for the whole run so an OCR worker never sees a half-updated output dir
+    with locked(output_dir / METADATA_LOCK_FILE):
+        queued = _process_items(
+            xochitl_dir, output_dir,
+            api_key=api_key,
+            ocr_cache=ocr_cache,
+            ocr_debug=ocr_debug,
+            no_thumbnails=no_thumbnails,
+            jobs=jobs,
+            ocr_options=ocr_options,
+            defer_ocr=defer_ocr,
+            on_items_published=on_items_published,
+            # Each pool worker has its own GCV client, so split the rate between them
+            ocr_budget=replace(ocr_budget, requests_per_minute=ocr_requests_per_minute / jobs)
+        )
+
+    if queued and api_key and not defer_ocr:
+        stats = process_ocr_queue(
+            output_dir, api_key,
+            ocr_options=ocr_options, ocr_cache=ocr_cache, ocr_debug=ocr_debug,
+            ocr_budget=ocr_budget
+        )
+        if stats['ocr_scans'] or stats['ocr_cache_hits']:
+            print(f"  {stats['ocr_scans'] + stats['ocr_cache_hits']} queued pages OCR'd "
+                  f"({stats['words_recognized']} words recognised)")
+        if stats['ocr_deferred']:
+            print(f"  OCR budget reached, {stats['pages_pending']} queued pages deferred to a later run")
+
+
+def _process_items(xochitl_dir: Path, output_dir: Path, *, api_key: str | None, ocr_cache: OCRCache | None,
+                   ocr_debug: bool, no_thumbnails: bool, jobs: int, ocr_options: OCRImageOptions | None,
+                   defer_ocr: bool, ocr_budget: OCRBudget | None,
+                   on_items_published: Callable[[list[str]], None] | None = None) -> int:
+    """
+    Parse every item into output_dir and write metadata.json, the manifest
+    and the OCR queue. Called by run_rm_process() with the metadata lock held.
+
+    :returns: Number of items left in the OCR queue
+    """
+    old_metadata = None
+    old_metadata_f = (output_dir / 'metadata.json')
+    if old_metadata_f.exists():
+        with open(old_metadata_f) as f:
+            old_metadata = json.load(f)
+
+    # Stat signatures of each item's source files from the last run
+    old_manifest = {}
+    manifest_f = output_dir / 'manifest.json'
+    if manifest_f.exists():
+        with open(manifest_f) as f:
+            old_manifest = json.load(f)
+
+    if old_metadata:
+        migrated = migrate_rm_hashes(old_metadata, output_dir)
+        if migrated:
+            log.info(f"Migrated {migrated} MD5 page hashes to xxh3")
+
     # Build lookup from old metadata
     old_items_by_id = {item['id']: item for item in old_metadata} if old_metadata else {}
+
+    # Items finished by an interrupted run supersede the last written metadata
+    journal_path = output_dir / PROCESS_JOURNAL_FILE
+    resumed = 0
+    if journal_path.exists():
+        for entry in read_json_lines(journal_path):
+            old_items_by_id[entry['id']] = entry['item']
+            old_manifest[entry['id']] = entry['signature']
+            resumed += 1
+        log.info(f"Resuming interrupted run, {resumed} items already processed")
     processed_ids = set()
-    summary = {'created': [], 'modified': [], 'deleted': [], 'unchanged': []}
+    summary = {'created': [], 'modified': [], 'metadata': [], 'deleted': [], 'unchanged': []}
 
     # Stats accumulators
     total_thumbnails = 0
     total_ocr_scans = 0
+    total_ocr_skipped = 0
+    total_ocr_cache_hits = 0
+    total_ocr_queued = 0
+    total_ocr_deferred = 0
     total_words = 0
+    total_pages_rendered = 0
+    total_render_cache_hits = 0
+    total_render_seconds = 0.0
+    max_render_seconds = 0.0
+    total_chrome_pages = 0
+    total_chrome_seconds = 0.0
+    max_chrome_seconds = 0.0
+    total_chrome_restarts = 0
 
     full_metadata = []
     errors = []
+    manifest = {}
 
     id_filemap = create_id_filemap(xochitl_dir)
+
+    # Items whose source files have the same stat signature as last run are
+    # unchanged; only the rest need hashing and parsing
+    signatures = {}
+    candidates = set()
     for id, files in id_filemap.items():
+        signatures[id] = stat_signature(files)
         old_item = old_items_by_id.get(id)
-        try:
-            result, status, stats = parse_item(id, files, output_dir, old_item, api_key=api_key, ocr_debug=ocr_debug, no_thumbnails=no_thumbnails)
+        if old_item and old_manifest.get(id) == signatures[id]:
+            if old_item.get('type') != 'book':
+                continue
+            if (output_dir / f"{old_item['name']} - {id}").exists():
+                continue
+        candidates.add(id)
+    log.info(f"{len(candidates)} of {len(id_filemap)} items changed since last run")
+
+    # Most recently used items first, so the notebook being written in isn't
+    # stuck behind a backlog. Ties keep filemap order, as do the merged results
+    schedule = sorted(
+        (id for id in id_filemap if id in candidates),
+        key=lambda id: get_recency(id_filemap[id]), reverse=True
+    )
+
+    item_kwargs = {
+        'api_key': api_key,
+        'ocr_debug': ocr_debug,
+        'no_thumbnails': no_thumbnails,
+        'ocr_options': ocr_options,
+        'ocr_cache': ocr_cache,
+        'defer_ocr': defer_ocr,
+        'ocr_budget': ocr_budget
+    }
+
+    def iter_results():
+        """Yield (id, outcome) for each changed item as it finishes."""
+        if jobs <= 1:
+            for id in schedule:
+                yield id, _parse_item_task(
+                    id, id_filemap[id], output_dir, old_items_by_id.get(id), **item_kwargs
+                )
+            return
+
+        log.info(f"Processing items with {jobs} workers")
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            # Submitted in schedule order, so workers pick items up in that order
+            futures = {
+                pool.submit(
+                    _parse_item_task,
+                    id, id_filemap[id], output_dir, old_items_by_id.get(id), **item_kwargs
+                ): id
+                for id in schedule
+            }
+            for future in as_completed(futures):
+                try:
+                    outcome = future.result()
+                except Exception:
+                    # Worker died (e.g. killed by OOM) before returning
+                    outcome = ('error', traceback.format_exc())
+                yield futures[future], outcome
+
+    # What the viewer sees mid-run: the last metadata, updated as items finish
+    publisher = None
+    if on_items_published:
+        publisher = _MetadataPublisher(old_metadata_f, old_items_by_id, on_items_published)
+
+    outcomes = {}
+    try:
+        for id, outcome in iter_results():
+            outcomes[id] = outcome
+            kind, value = outcome
+            if kind == 'ok' and value[0] and value[1] != 'unchanged':
+                append_json_line(journal_path, {
+                    'id': id, 'signature': signatures[id], 'item': value[0]
+                })
+                if publisher:
+                    publisher.add(value[0])
+    finally:
+        unpublished = publisher.close() if publisher else []
+
+    for id, files in id_filemap.items():
+        old_item = old_items_by_id.get(id)
+        if id not in outcomes:
+            log.debug(f'Unchanged (stat): {id}')
+        kind, value = outcomes.get(id) or ('ok', (old_item, 'unchanged', {}))
+        if kind == 'ok':
+            result, status, stats = value
             if result:
                 full_metadata.append(result)
                 processed_ids.add(id)
+                manifest[id] = signatures[id]
                 if status in summary:
                     summary[status].append(result.get('name', id))
                 # Accumulate stats
                 total_thumbnails += stats.get('thumbnails_generated', 0)
                 total_ocr_scans += stats.get('ocr_scans', 0)
+                total_ocr_skipped += stats.get('ocr_skipped', 0)
+                total_ocr_cache_hits += stats.get('ocr_cache_hits', 0)
+                total_ocr_queued += stats.get('ocr_queued', 0)
+                total_ocr_deferred += stats.get('ocr_deferred', 0)
                 total_words += stats.get('words_recognized', 0)
-        except Exception:
+                total_pages_rendered += stats.get('pages_rendered', 0)
+                total_render_cache_hits += stats.get('render_cache_hits', 0)
+                total_render_seconds += stats.get('render_seconds', 0.0)
+                max_render_seconds = max(max_render_seconds, stats.get('max_render_seconds', 0.0))
+                total_chrome_pages += stats.get('chrome_pages', 0)
+                total_chrome_seconds += stats.get('chrome_seconds', 0.0)
+                max_chrome_seconds = max(max_chrome_seconds, stats.get('chrome_max_seconds', 0.0))
+                total_chrome_restarts += stats.get('chrome_restarts', 0)
+        else:
             name = try_get_name(files)
-            tb = traceback.format_exc()
+            tb = value
             errors.append({'name': name, 'id': id, 'error': tb})
-            log.error(f'Item "{name}" (UUID: {id}) failed to parse! Traceback:\n{traceback.format_exc()}')
+            log.error(f'Item "{name}" (UUID: {id}) failed to parse! Traceback:\n{tb}')
             # Keep old item in metadata if it exists (don't lose data on error)
             if old_item:
                 full_metadata.append(old_item)
@@ -889,32 +1927,269 @@ def run_rm_process(xochitl_dir: Path, output_dir: Path, *, no_ocr=False, ocr_deb
                     log.info(f"Deleting removed item: {old_item['name']}")
                     shutil.rmtree(old_dir)
 
-    metadata_path = output_dir / 'metadata.json'
-    with open(metadata_path, 'w') as f:
-        json.dump(full_metadata, f, indent=2)
+    # Metadata before the manifest: a manifest newer than the metadata would
+    # mark items as unchanged that the metadata doesn't have yet
+    write_json_atomic(output_dir / 'metadata.json', full_metadata, indent=2)
+    write_json_atomic(manifest_f, manifest)
 
     if errors:
-        errors_path = output_dir / 'errors.json'
-        with open(errors_path, 'w') as f:
-            json.dump(errors, f, indent=2)
+        write_json_atomic(output_dir / 'errors.json', errors, indent=2)
+
+    # Items with pages still waiting on OCR, including ones left from earlier runs
+    ocr_queue = [
+        item['id'] for item in full_metadata
+        if any(rm_file.get('ocr_pending') for rm_file in item.get('rm_files', []))
+    ]
+    write_json_atomic(output_dir / OCR_QUEUE_FILE, ocr_queue)
+
+    # Everything journalled is now in metadata.json
+    journal_path.unlink(missing_ok=True)
+
+    if unpublished:
+        on_items_published(unpublished)
+
+    ocr_cache_stats = ocr_cache.evict() if ocr_cache else None
 
     # Print summary
     print("\nSummary:")
+    if resumed:
+        print(f"  Resumed interrupted run ({resumed} items already processed)")
     if summary['created']:
         print(f"  {len(summary['created'])} notebooks created: {', '.join(summary['created'])}")
     if summary['modified']:
         print(f"  {len(summary['modified'])} notebooks modified: {', '.join(summary['modified'])}")
+    if summary['metadata']:
+        print(f"  {len(summary['metadata'])} notebooks with metadata-only changes: {', '.join(summary['metadata'])}")
     if summary['deleted']:
         print(f"  {len(summary['deleted'])} notebooks deleted: {', '.join(summary['deleted'])}")
     if summary['unchanged']:
         print(f"  {len(summary['unchanged'])} notebooks unchanged (skipped)")
+    if total_pages_rendered:
+        avg_ms = total_render_seconds / total_pages_rendered * 1000
+        print(f"  {total_pages_rendered} pages rendered "
+              f"({avg_ms:.0f} ms/page average, {max_render_seconds * 1000:.0f} ms max)")
+    if total_render_cache_hits:
+        print(f"  {total_render_cache_hits} unchanged pages reused from render cache")
+    if total_chrome_pages:
+        avg_ms = total_chrome_seconds / total_chrome_pages * 1000
+        print(f"  {total_chrome_pages} pages printed by pooled Chrome "
+              f"({avg_ms:.0f} ms/page average, {max_chrome_seconds * 1000:.0f} ms max)")
+    if total_chrome_restarts:
+        print(f"  {total_chrome_restarts} Chrome instances restarted")
     if total_thumbnails:
         print(f"  {total_thumbnails} thumbnails generated")
     if total_ocr_scans or total_words:
         print(f"  {total_ocr_scans} OCR scans completed ({total_words} words recognised)")
+    if total_ocr_cache_hits:
+        print(f"  {total_ocr_cache_hits} OCR results reused from shared cache")
+    if total_ocr_skipped:
+        print(f"  {total_ocr_skipped} blank pages skipped for OCR")
+    if total_ocr_queued:
+        print(f"  {total_ocr_queued} pages queued for background OCR")
+    if total_ocr_deferred:
+        print(f"  {total_ocr_deferred} pages over the OCR budget, deferred to a later run")
+    if ocr_cache_stats and (ocr_cache_stats['entries'] or ocr_cache_stats['evicted']):
+        print(f"  OCR cache: {ocr_cache_stats['entries']} entries, "
+              f"{ocr_cache_stats['bytes'] / (1024 * 1024):.1f} MB"
+              f" ({ocr_cache_stats['evicted']} evicted)")
     if errors:
         print(f"  {len(errors)} errors")
 
+    return len(ocr_queue)
+
+
+def process_ocr_queue(
+    output_dir: Path,
+    api_key: str,
+    *,
+    ocr_options: OCRImageOptions | None = None,
+    ocr_cache: OCRCache | None = None,
+    ocr_debug: bool = False,
+    on_item_done: Callable[[str], None] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+    ocr_budget: OCRBudget | None = None
+) -> dict:
+    """
+    Work through the OCR queue left by run_rm_process(). For each queued item,
+    its pending pages are OCR'd, then its output PDF text layer, search index
+    and metadata are rebuilt.
+
+    GCV is called without holding the metadata lock, so processor runs are
+    never held up by OCR. If the item was reprocessed in the meantime, only
+    results for pages whose .rm file and render size are unchanged are kept;
+    metadata-only edits such as renames and moves don't throw OCR away.
+
+    Items are tried once per call; pages that fail stay queued for next time.
+    Stops early once ocr_budget runs out.
+
+    :param output_dir: Processed output dir
+    :param api_key: Google Cloud Vision API key
+    :param ocr_options: How pages are rasterised for OCR
+    :param ocr_cache: Shared OCR cache, or None
+    :param ocr_debug: If True, make OCR text visible for debugging
+    :param on_item_done: Called with the item ID after its output is updated
+    :param should_stop: Polled between items; stops early if it returns True
+    :param ocr_budget: Limits on GCV usage, or None for no limits
+    :returns: Stats dict with items, ocr_scans, ocr_cache_hits, ocr_failed,
+              ocr_deferred, words_recognized, and pages_pending across the
+              whole queue when done
+    """
+    ocr_options = ocr_options or OCRImageOptions()
+    lock_path = output_dir / METADATA_LOCK_FILE
+    queue_path = output_dir / OCR_QUEUE_FILE
+    metadata_path = output_dir / 'metadata.json'
+    stats = {
+        'items': 0, 'ocr_scans': 0, 'ocr_cache_hits': 0, 'ocr_failed': 0,
+        'ocr_deferred': 0, 'words_recognized': 0
+    }
+    attempted = set()
+
+    def read_state() -> tuple[list[str], dict[str, dict]]:
+        queue = []
+        if queue_path.exists():
+            with open(queue_path) as f:
+                queue = json.load(f)
+        items_by_id = {}
+        if metadata_path.exists():
+            with open(metadata_path) as f:
+                items_by_id = {item['id']: item for item in json.load(f)}
+        return queue, items_by_id
+
+    while not (should_stop and should_stop()):
+        with locked(lock_path):
+            queue, items_by_id = read_state()
+        id = next((id for id in queue if id not in attempted), None)
+        if id is None:
+            break
+        attempted.add(id)
+
+        item = items_by_id.get(id)
+        pending = [
+            rm_file for rm_file in (item or {}).get('rm_files', [])
+            if rm_file.get('ocr_pending')
+        ]
+        log.info(f"OCR for {len(pending)} queued pages of \"{(item or {}).get('name', id)}\"")
+
+        # Results go to temporary files until the pages are known to be
+        # unchanged. Not in the notebook's dir, which moves if it's renamed
+        tmp_paths = [
+            output_dir / f".{id}.{rm_file['page_id']}.{os.getpid()}{OCR_SUFFIX}.tmp"
+            for rm_file in pending
+        ]
+        try:
+            outcomes = ocr_pages([
+                (output_dir / rm_file['out_path'], tmp_path, rm_file['rm_hash'], rm_file.get('render_dims'))
+                for rm_file, tmp_path in zip(pending, tmp_paths)
+            ], api_key, ocr_options, ocr_cache, ocr_budget=ocr_budget)
+        except Exception as e:
+            log.warning(f"OCR failed for item {id}: {e}")
+            outcomes = [None] * len(pending)
+
+        updated = False
+        with locked(lock_path):
+            queue, items_by_id = read_state()
+            current = items_by_id.get(id)
+            if (output_dir / PROCESS_JOURNAL_FILE).exists():
+                # metadata.json may be stale until the processor resumes
+                log.info(f"Processor run was interrupted, dropping OCR results for item {id}")
+            elif current is None:
+                log.info(f"Item {id} was deleted while OCR was running, dropping results")
+            else:
+                try:
+                    updated = _apply_ocr_results(
+                        output_dir, current, pending, tmp_paths, outcomes, stats, ocr_debug
+                    )
+                except Exception as e:
+                    log.warning(f"Failed to add OCR results to item {id}: {e}")
+
+            if updated:
+                write_json_atomic(metadata_path, list(items_by_id.values()), indent=2)
+            still_pending = current is not None and any(
+                rm_file.get('ocr_pending') for rm_file in current.get('rm_files', [])
+            )
+            if id in queue and not still_pending:
+                queue.remove(id)
+                write_json_atomic(queue_path, queue)
+
+        for tmp_path in tmp_paths:
+            tmp_path.unlink(missing_ok=True)
+
+        if updated:
+            stats['items'] += 1
+            if on_item_done:
+                on_item_done(id)
+
+        if 'deferred' in outcomes:
+            log.info("OCR budget used up, leaving the rest of the queue for later")
+            break
+
+    with locked(lock_path):
+        queue, items_by_id = read_state()
+    stats['pages_pending'] = sum(
+        1 for id in queue
+        for rm_file in items_by_id.get(id, {}).get('rm_files', [])
+        if rm_file.get('ocr_pending')
+    )
+    log.info(f"OCR queue: {stats['items']} notebooks updated, {stats['pages_pending']} pages still pending")
+    return stats
+
+
+def _apply_ocr_results(
+    output_dir: Path,
+    item: dict,
+    pending: list[dict],
+    tmp_paths: list[Path],
+    outcomes: list[str | None],
+    stats: dict,
+    ocr_debug: bool
+) -> bool:
+    """
+    Move finished OCR results into place and rebuild the item's output PDF
+    and search index from its composited PDF. Updates item in place.
+
+    :returns: True if any page gained OCR
+    """
+    rm_files_by_id = {rm_file['page_id']: rm_file for rm_file in item.get('rm_files', [])}
+    done = 0
+    new_words = 0
+    for rm_file, tmp_path, outcome in zip(pending, tmp_paths, outcomes):
+        current = rm_files_by_id.get(rm_file['page_id'])
+        if outcome in (None, 'deferred'):
+            stats['ocr_deferred' if outcome else 'ocr_failed'] += 1
+            continue
+        # Only keep results for what was actually OCR'd
+        if (current is None or not current.get('ocr_pending')
+                or current.get('rm_hash') != rm_file['rm_hash']
+                or current.get('render_dims') != rm_file.get('render_dims')):
+            continue
+        ocr_file_path = (output_dir / current['out_path']).with_name(f"{rm_file['page_id']}{OCR_SUFFIX}")
+        os.replace(tmp_path, ocr_file_path)
+        current['ocr_path'] = str(ocr_file_path.relative_to(output_dir))
+        current['ocr_pending'] = False
+        stats['ocr_cache_hits' if outcome == 'cached' else 'ocr_scans'] += 1
+        new_words += len(load_ocr_result(ocr_file_path).get('words', []))
+        done += 1
+
+    if not done:
+        return False
+
+    # Restitch from the composited PDF, so no page ends up with two text layers
+    output_pdf = output_dir / item['output_pdf']
+    nb_output_dir = output_pdf.parent
+    tmp_pdf = output_pdf.with_name(f'.{output_pdf.name}.{os.getpid()}.tmp')
+    shutil.copy2(nb_output_dir / 'assembly' / 'remarks.pdf', tmp_pdf)
+    try:
+        process_output_pages(
+            tmp_pdf, item['rm_files'], output_dir,
+            nb_output_dir / 'search_index.json', [], debug=ocr_debug
+        )
+        os.replace(tmp_pdf, output_pdf)
+    finally:
+        tmp_pdf.unlink(missing_ok=True)
+    # Only words from pages OCR'd just now, not every page restitched above
+    stats['words_recognized'] += new_words
+    return True
+
 
 def rm_process(args: argparse.Namespace):
     """CLI entry point — unpacks argparse and calls run_rm_process."""
@@ -924,4 +2199,50 @@ def rm_process(args: argparse.Namespace):
         no_ocr=getattr(args, 'no_ocr', False),
         ocr_debug=getattr(args, 'ocr_debug', False),
         no_thumbnails=getattr(args, 'no_thumbnails', False),
+        jobs=getattr(args, 'jobs', 1),
+        ocr_options=ocr_options_from_args(args),
+        ocr_cache_mb=getattr(args, 'ocr_cache_mb', 512),
+        defer_ocr=getattr(args, 'defer_ocr', False),
+        ocr_requests_per_minute=getattr(args, 'ocr_rate', GCV_REQUESTS_PER_MINUTE),
+        ocr_max_pages_per_run=getattr(args, 'ocr_max_pages_per_run', 0),
+        ocr_max_pages_per_day=getattr(args, 'ocr_max_pages_per_day', 0),
     )
+
+
+def ocr_worker(args: argparse.Namespace):
+    """CLI entry point — works through the OCR queue of an output dir."""
+    output_dir = Path(args.output_dir)
+    api_key = get_gcv_api_key()
+    if not api_key:
+        log.error("No GCV API key found, can't run OCR")
+        return
+
+    ocr_cache = None
+    if args.ocr_cache_mb > 0:
+        ocr_cache = OCRCache(output_dir / OCR_CACHE_DIR, args.ocr_cache_mb * 1024 * 1024)
+
+    stats = process_ocr_queue(
+        output_dir, api_key,
+        ocr_options=ocr_options_from_args(args),
+        ocr_cache=ocr_cache,
+        ocr_debug=args.ocr_debug,
+        ocr_budget=OCRBudget(
+            output_dir / OCR_USAGE_FILE,
+            max_pages_per_run=args.ocr_max_pages_per_run,
+            max_pages_per_day=args.ocr_max_pages_per_day,
+            requests_per_minute=args.ocr_rate
+        )
+    )
+    if ocr_cache:
+        ocr_cache.evict()
+
+    print("\nSummary:")
+    print(f"  {stats['items']} notebooks updated")
+    if stats['ocr_scans'] or stats['words_recognized']:
+        print(f"  {stats['ocr_scans']} OCR scans completed ({stats['words_recognized']} words recognised)")
+    if stats['ocr_cache_hits']:
+        print(f"  {stats['ocr_cache_hits']} OCR results reused from shared cache")
+    if stats['ocr_failed']:
+        print(f"  {stats['ocr_failed']} pages still queued after OCR failed")
+    if stats['ocr_deferred']:
+        print(f"  OCR budget reached, {stats['pages_pending']} queued pages deferred to a later run")
@@ -5,6 +5,7 @@ from pathlib import Path
 
 import zipfile
 from io import BytesIO
+from collections import deque
 
 from flask import Flask, send_from_directory, send_file, request, jsonify
 
@@ -15,6 +16,10 @@ from .rm_items import RemarkableDocument, RemarkableFolder
 
 STATIC_DIR = Path(__file__).with_name("web")
 
+# Rebuilds remembered for /api/generation?since=; clients further behind
+# than this are told everything may have changed
+GENERATION_HISTORY = 256
+
 def build_view_parser(parser: argparse._SubParsersAction):
     view_parser = parser.add_parser(
         'view',
@@ -36,6 +41,8 @@ def create_app(output_dir: Path) -> Flask:
 
     index = RemarkableIndex(output_dir)
     generation = 0
+    # (generation, IDs rebuilt or None for everything) of recent rebuilds
+    rebuilds = deque(maxlen=GENERATION_HISTORY)
 
     # UI
     @app.get("/")
@@ -109,13 +116,29 @@ def create_app(output_dir: Path) -> Flask:
     @app.post("/api/rebuild")
     def api_rebuild():
         nonlocal index, generation
-        index = RemarkableIndex(output_dir)
+        # Body of {"ids": [...]} re-reads just those items, otherwise everything
+        body = request.get_json(silent=True)
+        ids = body.get('ids') if isinstance(body, dict) else None
+        if ids:
+            index.rebuild(set(ids))
+        else:
+            index = RemarkableIndex(output_dir)
         generation += 1
+        rebuilds.append((generation, sorted(ids) if ids else None))
         return jsonify({"status": "ok"})
 
     @app.get("/api/generation")
     def api_generation():
-        return jsonify({"generation": generation})
+        # With ?since=N, also list the IDs rebuilt after generation N, or
+        # null if that isn't known (a full rebuild, or N is too far back)
+        since = request.args.get("since", type=int)
+        if since is None:
+            return jsonify({"generation": generation})
+        entries = [(gen, ids) for gen, ids in rebuilds if gen > since]
+        changed = None
+        if len(entries) == generation - since and all(ids is not None for _, ids in entries):
+            changed = sorted({id for _, ids in entries for id in ids})
+        return jsonify({"generation": generation, "changed": changed})
 
     @app.get("/api/download/zip")
     def api_download_zip():
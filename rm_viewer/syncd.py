@@ -1,20 +1,31 @@
+import json
 import fcntl
 import logging
 import argparse
 import subprocess
 import threading
 import time
+import uuid
 import urllib.request
 from pathlib import Path
 
-from .rm_process import run_rm_process
-from .utils import validate_output_path
+from .rm_process import (
+    run_rm_process, process_ocr_queue, add_ocr_arguments, ocr_options_from_args, OCR_QUEUE_FILE
+)
+from .ocr import OCRCache, OCRBudget, OCRImageOptions, OCR_CACHE_DIR, OCR_USAGE_FILE, GCV_REQUESTS_PER_MINUTE
+from .utils import validate_output_path, validate_jobs, get_gcv_api_key
 
 log = logging.getLogger(__name__)
 
+# Wait before retrying OCR queue items whose pages failed OCR or were over budget
+OCR_RETRY_SECONDS = 300
+
 
 class Syncd:
-    def __init__(self, sync_dir: Path, viewer_url: str = "http://127.0.0.1:5000"):
+    def __init__(self, sync_dir: Path, viewer_url: str = "http://127.0.0.1:5000", jobs: int = 1,
+                 defer_ocr: bool = True, ocr_requests_per_minute: float = GCV_REQUESTS_PER_MINUTE,
+                 ocr_max_pages_per_run: int = 0, ocr_max_pages_per_day: int = 0,
+                 ocr_options: OCRImageOptions | None = None, ocr_cache_mb: int = 512, ocr_debug: bool = False):
         self.sync_dir = sync_dir
         self.dirty = sync_dir / "xochitl-dirty"
         self.staging = sync_dir / "xochitl-staging"
@@ -24,12 +35,25 @@ class Syncd:
         self.syncflag = sync_dir / "syncflag"
         self.lock_file = sync_dir / "syncd.lock"
         self.viewer_url = viewer_url
+        self.jobs = jobs
+        self.defer_ocr = defer_ocr
+        self.ocr_requests_per_minute = ocr_requests_per_minute
+        self.ocr_max_pages_per_run = ocr_max_pages_per_run
+        self.ocr_max_pages_per_day = ocr_max_pages_per_day
+        self.ocr_options = ocr_options
+        self.ocr_cache_mb = ocr_cache_mb
+        self.ocr_debug = ocr_debug
 
         # In-memory state
         self.staging_full: bool = False
         self.processing: bool = False
         self.process_thread: threading.Thread | None = None
         self.process_error: bool = False
+        self.ocr_thread: threading.Thread | None = None
+        self.ocr_retry_at: float = 0.0
+        # OCR budget run ID, shared by a sync's processor run and the OCR
+        # threads after it, so --ocr-max-pages-per-run is per sync
+        self.ocr_run_id: str = uuid.uuid4().hex
 
     def ensure_dirs(self):
         """Create the directory structure if it doesn't exist."""
@@ -71,17 +95,75 @@ class Syncd:
         """Target for the processing thread."""
         try:
             log.info("rm_process starting")
-            run_rm_process(self.xochitl, self.process_out)
+            run_rm_process(
+                self.xochitl, self.process_out,
+                jobs=self.jobs,
+                defer_ocr=self.defer_ocr,
+                ocr_options=self.ocr_options,
+                ocr_cache_mb=self.ocr_cache_mb,
+                ocr_debug=self.ocr_debug,
+                ocr_requests_per_minute=self.ocr_requests_per_minute,
+                ocr_max_pages_per_run=self.ocr_max_pages_per_run,
+                ocr_max_pages_per_day=self.ocr_max_pages_per_day,
+                ocr_run_id=self.ocr_run_id,
+                # Show notebooks as they're done, not after the whole sync
+                on_items_published=self._trigger_viewer_rebuild,
+            )
             log.info("rm_process completed successfully")
         except Exception:
             log.exception("rm_process failed")
             self.process_error = True
 
-    def _trigger_viewer_rebuild(self):
-        """POST /api/rebuild to the viewer. Non-fatal on failure."""
+    def _ocr_queue_waiting(self) -> bool:
+        """True if the processor left items in the OCR queue."""
+        queue_path = self.process_out / OCR_QUEUE_FILE
+        try:
+            with open(queue_path) as f:
+                return bool(json.load(f))
+        except (OSError, ValueError):
+            return False
+
+    def _run_ocr_thread(self, api_key: str):
+        """Target for the background OCR thread."""
+        try:
+            log.info("ocr worker starting")
+            ocr_cache = None
+            if self.ocr_cache_mb > 0:
+                ocr_cache = OCRCache(self.process_out / OCR_CACHE_DIR, self.ocr_cache_mb * 1024 * 1024)
+            stats = process_ocr_queue(
+                self.process_out, api_key,
+                ocr_options=self.ocr_options,
+                ocr_cache=ocr_cache,
+                ocr_debug=self.ocr_debug,
+                # Each notebook's search data goes live as soon as it's ready
+                on_item_done=lambda id: self._trigger_viewer_rebuild([id]),
+                # Give way to the next sync; the queue is picked up again after it
+                should_stop=lambda: self.processing or self.staging_full,
+                ocr_budget=OCRBudget(
+                    self.process_out / OCR_USAGE_FILE,
+                    max_pages_per_run=self.ocr_max_pages_per_run,
+                    max_pages_per_day=self.ocr_max_pages_per_day,
+                    requests_per_minute=self.ocr_requests_per_minute,
+                    run_id=self.ocr_run_id,
+                ),
+            )
+            if ocr_cache:
+                ocr_cache.evict()
+            if stats['ocr_failed'] or stats['ocr_deferred']:
+                self.ocr_retry_at = time.monotonic() + OCR_RETRY_SECONDS
+            log.info("ocr worker finished")
+        except Exception:
+            log.exception("ocr worker failed")
+
+    def _trigger_viewer_rebuild(self, ids: list[str] | None = None):
+        """POST /api/rebuild to the viewer, for just ids if given. Non-fatal on failure."""
         url = f"{self.viewer_url}/api/rebuild"
+        data, headers = b"", {}
+        if ids:
+            data = json.dumps({"ids": ids}).encode()
+            headers = {"Content-Type": "application/json"}
         try:
-            req = urllib.request.Request(url, method="POST", data=b"")
+            req = urllib.request.Request(url, method="POST", data=data, headers=headers)
             with urllib.request.urlopen(req, timeout=5) as resp:
                 log.info(f"viewer rebuild: {resp.status}")
         except Exception as e:
@@ -122,6 +204,7 @@ class Syncd:
             try:
                 self._rsync(self.staging, self.xochitl)
                 self.process_error = False
+                self.ocr_run_id = uuid.uuid4().hex
                 self.process_thread = threading.Thread(
                     target=self._run_process_thread,
                     daemon=True,
@@ -134,6 +217,19 @@ class Syncd:
             except RuntimeError:
                 log.error("promote: rsync failed, will retry next cycle")
 
+        # Phase 4: OCR — work through the OCR queue while idle
+        ocr_idle = self.ocr_thread is None or not self.ocr_thread.is_alive()
+        ocr_due = time.monotonic() >= self.ocr_retry_at
+        if not self.processing and not self.staging_full and ocr_idle and ocr_due \
+                and self._ocr_queue_waiting():
+            api_key = get_gcv_api_key()
+            if api_key:
+                self.ocr_thread = threading.Thread(
+                    target=self._run_ocr_thread, args=(api_key,), daemon=True,
+                )
+                self.ocr_thread.start()
+                log.info("ocr: background OCR thread started")
+
         return changed
 
     def wait_any(self, timeout: float = 5.0, interval: float = 0.5):
@@ -180,6 +276,15 @@ def build_syncd_parser(parser: argparse._SubParsersAction):
         default="http://127.0.0.1:5000",
         help="URL of the rm-viewer instance for rebuild notifications (default: http://127.0.0.1:5000)",
     )
+    syncd_parser.add_argument(
+        "--jobs", "-j", type=validate_jobs, default=1,
+        help="Number of items to process in parallel (default: 1)",
+    )
+    syncd_parser.add_argument(
+        "--inline-ocr", action="store_true",
+        help="OCR pages before publishing each sync, instead of in the background",
+    )
+    add_ocr_arguments(syncd_parser)
 
 
 def rm_syncd(args: argparse.Namespace):
@@ -234,7 +339,18 @@ def rm_syncd(args: argparse.Namespace):
         raise SystemExit(1)
 
     try:
-        syncd = Syncd(sync_dir, viewer_url=viewer_url)
+        syncd = Syncd(
+            sync_dir,
+            viewer_url=viewer_url,
+            jobs=args.jobs,
+            defer_ocr=not args.inline_ocr,
+            ocr_requests_per_minute=args.ocr_rate,
+            ocr_max_pages_per_run=args.ocr_max_pages_per_run,
+            ocr_max_pages_per_day=args.ocr_max_pages_per_day,
+            ocr_options=ocr_options_from_args(args),
+            ocr_cache_mb=args.ocr_cache_mb,
+            ocr_debug=args.ocr_debug,
+        )
         syncd.run()
     finally:
         fcntl.flock(lock_fd, fcntl.LOCK_UN)
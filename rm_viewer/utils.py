@@ -1,8 +1,19 @@
 import os
 import sys
+import json
+import fcntl
+import errno
+import shutil
 import logging
 import argparse
+import platform
 from pathlib import Path
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# Linux ioctl to share a file's extents with another file (btrfs, XFS, ...)
+FICLONE = 0x40049409
 
 def setup_logger(log):
     blue = '\033[94m'
@@ -40,6 +51,35 @@ def validate_output_path(path):
         os.makedirs(path)
     return path
 
+def validate_jobs(value):
+    try:
+        jobs = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid job count")
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(f"job count must be at least 1, got {jobs}")
+    return jobs
+
+
+def validate_jpeg_quality(value):
+    try:
+        quality = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid JPEG quality")
+    if not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError(f"JPEG quality must be between 1 and 100, got {quality}")
+    return quality
+
+
+def validate_non_negative(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid whole number")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"value must be 0 or more, got {number}")
+    return number
+
 
 def get_gcv_api_key() -> str | None:
     """
@@ -62,3 +102,142 @@ def get_gcv_api_key() -> str | None:
         return config_path.read_text().strip()
 
     return None
+
+
+def _reflink(src: Path, dst: Path):
+    """Create dst as a copy-on-write clone of src. Raises OSError if unsupported."""
+    system = platform.system()
+    if system == 'Linux':
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                dst.unlink(missing_ok=True)
+                raise
+    elif system == 'Darwin':
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+    else:
+        raise OSError(errno.ENOTSUP, 'reflink not supported on this platform')
+
+
+# Best staging method found per (source device, destination device)
+_stage_methods: dict[tuple[int, int], str] = {}
+
+# os.link errors meaning hardlinks can't be used here, so copy instead
+HARDLINK_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK}
+
+
+def stage_file(src: Path, dst: Path) -> str:
+    """
+    Place a copy of src at dst as cheaply as the filesystem allows.
+
+    Tries a reflink (copy-on-write clone), then a hardlink, then falls back to
+    a full copy. Hardlinked files share data with the source, so they must
+    only ever be replaced, never modified in place. For the same reason an
+    existing dst is unlinked first rather than written into; use
+    restage_file() to replace dst atomically.
+
+    :returns: The method used: 'reflink', 'hardlink' or 'copy'
+    """
+    src, dst = Path(src), Path(dst)
+    if dst.is_dir():
+        dst = dst / src.name
+    dst.unlink(missing_ok=True)
+    key = (src.stat().st_dev, dst.parent.stat().st_dev)
+    known = _stage_methods.get(key)
+
+    for method in ('reflink', 'hardlink'):
+        if known is not None and known != method:
+            continue
+        try:
+            if method == 'reflink':
+                _reflink(src, dst)
+            else:
+                os.link(src, dst)
+        except OSError as e:
+            if method == 'hardlink' and e.errno not in HARDLINK_UNSUPPORTED_ERRNOS:
+                raise
+            continue
+        _stage_methods[key] = method
+        return method
+
+    shutil.copy(src, dst)
+    if known is None:
+        log.debug(f"Reflinks and hardlinks unavailable for {dst.parent}, copying")
+        _stage_methods[key] = 'copy'
+    return 'copy'
+
+
+def restage_file(src: Path, dst: Path):
+    """Atomically replace dst with a staged copy of src (never writing into dst)."""
+    tmp_path = dst.with_name(f'{dst.name}.{os.getpid()}.tmp')
+    tmp_path.unlink(missing_ok=True)
+    stage_file(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def stage_tree(src: Path, dst: Path):
+    """Recursively stage a directory tree with stage_file()."""
+    dst.mkdir(parents=True)
+    for child in src.iterdir():
+        if child.is_dir():
+            stage_tree(child, dst / child.name)
+        else:
+            stage_file(child, dst / child.name)
+
+
+@contextmanager
+def locked(lock_path: Path):
+    """Hold an exclusive flock on lock_path for the duration of the block."""
+    with open(lock_path, 'a') as lock_fd:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+
+def write_json_atomic(path: Path, data, **kwargs):
+    """
+    Write JSON to path via a temp file and rename, so readers never see a
+    partially written file, even after a crash.
+
+    :param kwargs: Passed through to json.dump
+    """
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, **kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def append_json_line(path: Path, record):
+    """
+    Append record to a JSON lines file and fsync it, so it survives the
+    process being killed straight after.
+    """
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_json_lines(path: Path) -> list:
+    """
+    Read the records of a JSON lines file. A truncated final line, left by a
+    write that was interrupted, is ignored.
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
@@ -857,7 +857,9 @@ function refreshView() {
 //
 // When the generation changes:
 //   1. The folder view always refreshes.
-//   2. If a PDF is open, we HEAD the PDF URL to compare Last-Modified.
+//   2. If a PDF is open and its item is among the changed IDs (or the server
+//      can't say which items changed, e.g. after a full rebuild), we HEAD the
+//      PDF URL to compare Last-Modified.
 //      - Unchanged file → do nothing (avoids disruptive reloads).
 //      - Changed file   → reload the PDF, preserving viewport state.
 //      - Missing file   → close the viewer and clean up localStorage.
@@ -872,9 +874,10 @@ let knownGeneration = null;
 
 setInterval(async () => {
   try {
-    const res = await fetch('/api/generation');
+    const query = knownGeneration === null ? '' : `?since=${knownGeneration}`;
+    const res = await fetch(`/api/generation${query}`);
     if (!res.ok) return;
-    const { generation } = await res.json();
+    const { generation, changed } = await res.json();
     if (knownGeneration === null) {
       knownGeneration = generation;
       return;
@@ -885,7 +888,8 @@ setInterval(async () => {
     await navigateTo(currentFolderId);
 
     const pdfItemId = localStorage.getItem('rmviewer.pdfItemId');
-    if (pdfItemId && currentPdfUrl) {
+    const pdfChanged = !Array.isArray(changed) || changed.includes(pdfItemId);
+    if (pdfItemId && currentPdfUrl && pdfChanged) {
       const head = await fetch(currentPdfUrl, { method: 'HEAD' });
       if (!head.ok) {
         localStorage.removeItem('rmviewer.pdfItemId');
@@ -0,0 +1,217 @@
+import json
+import sys
+import textwrap
+import tempfile
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import fitz
+import pytest
+
+from rm_viewer import rm_process, render, ocr
+
+# A single stroke, enough for the fake Chrome below to draw something
+PAGE_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="1404" height="1872">'
+    '<path d="M 100 100 L 400 300"/></svg>'
+)
+
+# Headless Chrome stand-in speaking the DevTools pipe protocol on fds 3 and 4
+FAKE_CHROME = '''\
+    import os, sys, json, base64, re
+    import fitz
+    inp = os.fdopen(3, 'rb', buffering=0)
+    out = os.fdopen(4, 'wb', buffering=0)
+    buf = b''
+    html = ''
+    def send(message):
+        out.write(json.dumps(message).encode() + b'\\0')
+    while True:
+        chunk = inp.read(65536)
+        if not chunk:
+            break
+        buf += chunk
+        while b'\\0' in buf:
+            raw, buf = buf.split(b'\\0', 1)
+            msg = json.loads(raw)
+            method, result = msg['method'], {}
+            if method == 'Target.createTarget':
+                result = {'targetId': 'T'}
+            elif method == 'Target.attachToTarget':
+                result = {'sessionId': 'S'}
+            elif method == 'Page.getFrameTree':
+                result = {'frameTree': {'frame': {'id': 'F'}}}
+            elif method == 'Page.setDocumentContent':
+                html = msg['params']['html']
+            elif method == 'Page.printToPDF':
+                params = msg['params']
+                doc = fitz.open()
+                page = doc.new_page(width=params['paperWidth'] * 72,
+                                    height=params['paperHeight'] * 72)
+                for m in re.finditer(r'M ([\\d.]+) ([\\d.]+) L ([\\d.]+) ([\\d.]+)', html):
+                    x0, y0, x1, y1 = map(float, m.groups())
+                    page.draw_line((x0, y0), (x1, y1))
+                result = {'data': base64.b64encode(doc.tobytes()).decode()}
+            elif method == 'Browser.close':
+                send({'id': msg['id'], 'result': {}})
+                sys.exit(0)
+            send({'id': msg['id'], 'result': result})
+'''
+
+
+def write_document(
+    xochitl_dir: Path,
+    id: str,
+    name: str,
+    page_ids: list[str],
+    rm_pages: tuple[str, ...] = (),
+    backing_pages: int = 0,
+    parent: str = ''
+):
+    """Write a document's .metadata, .content, .rm files and backing PDF."""
+    (xochitl_dir / f'{id}.metadata').write_text(json.dumps({
+        'visibleName': name, 'parent': parent, 'type': 'DocumentType'
+    }))
+    pages = []
+    for i, page_id in enumerate(page_ids):
+        page = {'id': page_id, 'idx': {'value': str(i)}}
+        if i < backing_pages:
+            page['redir'] = {'value': i}
+        pages.append(page)
+    (xochitl_dir / f'{id}.content').write_text(json.dumps({
+        'fileType': 'pdf' if backing_pages else 'notebook',
+        'cPages': {'pages': pages}
+    }))
+    if backing_pages:
+        backing = fitz.open()
+        for _ in range(backing_pages):
+            backing.new_page(width=500, height=700)
+        backing.save(xochitl_dir / f'{id}.pdf')
+    if rm_pages:
+        (xochitl_dir / id).mkdir()
+        for page_id in rm_pages:
+            (xochitl_dir / id / f'{page_id}.rm').write_bytes(f'strokes {page_id}'.encode())
+
+
+@pytest.fixture
+def remarks_calls(monkeypatch) -> list[list[str]]:
+    """
+    Replace remarks and .rm to SVG conversion with stand-ins. Returns the page
+    IDs of each remarks run, in the order they happened (serial runs only).
+    """
+    calls = []
+
+    def run_remarks(xochitl_dir, out_dir):
+        xochitl_dir, out_dir = Path(xochitl_dir), Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        metadata_file = next(xochitl_dir.glob('*.metadata'))
+        id = metadata_file.name.split('.')[0]
+        metadata = json.loads(metadata_file.read_text())
+        content = json.loads((xochitl_dir / f'{id}.content').read_text())
+        pages = content['cPages']['pages']
+        calls.append([page['id'] for page in pages])
+
+        backing_file = xochitl_dir / f'{id}.pdf'
+        backing = fitz.open(backing_file) if backing_file.exists() else None
+        doc = fitz.open()
+        for page in pages:
+            redir = page.get('redir', {}).get('value')
+            if backing is not None and redir is not None:
+                doc.insert_pdf(backing, from_page=redir, to_page=redir)
+            else:
+                doc.new_page(width=500, height=700)
+            highlights = xochitl_dir / f'{id}.highlights' / f"{page['id']}.json"
+            label = highlights.read_text() if highlights.exists() else ''
+            doc[-1].insert_text((10, 20), f"{page['id']} {label}")
+            if (xochitl_dir / id / f"{page['id']}.rm").exists():
+                doc[-1].draw_rect(fitz.Rect(50, 50, 150, 80))
+        doc.save(out_dir / f"{metadata['visibleName']} _remarks.pdf")
+
+    monkeypatch.setattr(rm_process, 'run_remarks', run_remarks)
+    monkeypatch.setattr(rm_process, 'rm_to_svg_no_text', lambda rm_path: PAGE_SVG)
+    monkeypatch.setattr(rm_process, 'get_gcv_api_key', lambda: None)
+    return calls
+
+
+@pytest.fixture
+def fake_chrome(tmp_path, monkeypatch) -> Path:
+    """
+    Point the render pool at a fake Chrome, with temp files (including Chrome
+    profile dirs) under the returned directory.
+    """
+    chrome = tmp_path / 'chrome'
+    chrome.write_text(f'#!{sys.executable}\n' + textwrap.dedent(FAKE_CHROME))
+    chrome.chmod(0o755)
+    monkeypatch.setenv('CHROME_PATH', str(chrome))
+
+    temp_dir = tmp_path / 'tmp'
+    temp_dir.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(temp_dir))
+
+    render.close_render_pool()
+    monkeypatch.setattr(render, '_pool_unavailable', False)
+    yield temp_dir
+    render.close_render_pool()
+
+
+def gcv_word(text: str = 'hello') -> dict:
+    """A GCV TEXT_DETECTION response for one image holding a single word."""
+    vertices = [{'x': 100, 'y': 100}, {'x': 300, 'y': 100}, {'x': 300, 'y': 150}, {'x': 100, 'y': 150}]
+    return {'textAnnotations': [
+        {'description': text, 'boundingPoly': {'vertices': vertices}},
+        {'description': text, 'boundingPoly': {'vertices': vertices}},
+    ]}
+
+
+class FakeGCV:
+    """
+    Local images:annotate stand-in. Each request's images are recorded in
+    `requests`; `respond(body)` returns (status, response dict), by default
+    one word per image.
+    """
+
+    def __init__(self):
+        self.requests: list[list[dict]] = []
+        self.respond = lambda body: (200, {'responses': [gcv_word() for _ in body['requests']]})
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                fake.requests.append(body['requests'])
+                status, response = fake.respond(body)
+                out = json.dumps(response).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}/v1/images:annotate'
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def gcv_server(monkeypatch) -> FakeGCV:
+    """
+    Send GCV requests to a FakeGCV, with no rate limit or retry backoff, and
+    give rm_process an API key (so request this after remarks_calls).
+    """
+    fake = FakeGCV()
+    monkeypatch.setenv('GCV_ENDPOINT', fake.endpoint)
+    monkeypatch.setattr(ocr, 'GCV_BACKOFF_SECONDS', 0)
+    monkeypatch.setattr(ocr, '_client', None)
+    monkeypatch.setattr(rm_process, 'get_gcv_api_key', lambda: 'test-key')
+    yield fake
+    fake.close()
@@ -0,0 +1,74 @@
+import threading
+
+from rm_viewer.ocr import GCVClient
+
+from conftest import gcv_word
+
+
+def make_client(**kwargs) -> GCVClient:
+    return GCVClient('test-key', requests_per_minute=0, **kwargs)
+
+
+def test_images_are_split_into_batches(gcv_server):
+    client = make_client(batch_size=4)
+    images = [f'image {i}'.encode() for i in range(10)]
+
+    results = client.annotate(images)
+
+    assert all(results)
+    assert sorted(len(batch) for batch in gcv_server.requests) == [2, 4, 4]
+
+
+def test_rate_limiting_and_server_errors_are_retried(gcv_server):
+    statuses = iter([429, 503])
+    lock = threading.Lock()
+
+    def respond(body):
+        with lock:
+            status = next(statuses, 200)
+        if status != 200:
+            return status, {'error': {'message': 'busy'}}
+        return 200, {'responses': [gcv_word() for _ in body['requests']]}
+    gcv_server.respond = respond
+    client = make_client()
+
+    results = client.annotate([b'image'])
+
+    assert results[0]['responses'][0]['textAnnotations'][0]['description'] == 'hello'
+    assert client.retries == 2
+    assert len(gcv_server.requests) == 3
+
+
+def test_per_image_error_fails_only_that_image(gcv_server):
+    gcv_server.respond = lambda body: (200, {'responses': [
+        {'error': {'message': 'bad image'}} if i == 1 else gcv_word()
+        for i in range(len(body['requests']))
+    ]})
+    client = make_client()
+
+    results = client.annotate([b'first', b'second', b'third'])
+
+    assert [result is not None for result in results] == [True, False, True]
+
+
+def test_rejected_batch_is_resent_per_image(gcv_server):
+    def respond(body):
+        # Rejects any request holding the bad image
+        if any(request['image']['content'] == 'YmFk' for request in body['requests']):
+            return 400, {'error': {'message': 'bad image'}}
+        return 200, {'responses': [gcv_word() for _ in body['requests']]}
+    gcv_server.respond = respond
+    client = make_client()
+
+    results = client.annotate([b'good', b'bad', b'also good'])
+
+    assert [result is not None for result in results] == [True, False, True]
+    assert [len(batch) for batch in gcv_server.requests] == [3, 1, 1, 1]
+
+
+def test_bad_key_is_not_resent_per_image(gcv_server):
+    gcv_server.respond = lambda body: (403, {'error': {'message': 'bad key'}})
+    client = make_client()
+
+    assert client.annotate([b'first', b'second']) == [None, None]
+    assert len(gcv_server.requests) == 1
@@ -0,0 +1,30 @@
+import fitz
+
+from rm_viewer import rm_process
+
+from conftest import write_document
+
+DOC_ID = '5b1f0a6e-4c1e-4d3a-9a43-2f7f6c0d9e11'
+PAGE_IDS = ['q1', 'q2', 'q3']
+
+
+def test_highlight_edit_rerenders_page(tmp_path, remarks_calls):
+    xochitl_dir = tmp_path / 'xochitl'
+    xochitl_dir.mkdir()
+    write_document(xochitl_dir, DOC_ID, 'Highlighted', PAGE_IDS, backing_pages=3)
+    highlights_dir = xochitl_dir / f'{DOC_ID}.highlights'
+    highlights_dir.mkdir()
+    (highlights_dir / 'q1.json').write_text('first')
+    output_dir = tmp_path / 'out'
+
+    rm_process.run_rm_process(xochitl_dir, output_dir, no_thumbnails=True)
+    assert remarks_calls == [PAGE_IDS]
+
+    (highlights_dir / 'q1.json').write_text('second')
+    rm_process.run_rm_process(xochitl_dir, output_dir, no_thumbnails=True)
+    assert remarks_calls[1:] == [['q1']]
+
+    output_pdf = output_dir / f'Highlighted - {DOC_ID}' / 'Highlighted.pdf'
+    with fitz.open(output_pdf) as doc:
+        assert 'q1 second' in doc[0].get_text()
+        assert 'q2' in doc[1].get_text()
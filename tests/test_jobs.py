@@ -0,0 +1,33 @@
+import json
+
+import fitz
+
+from rm_viewer import rm_process
+
+from conftest import write_document
+
+
+def test_parallel_run_matches_serial_run(tmp_path, remarks_calls, fake_chrome):
+    xochitl_dir = tmp_path / 'xochitl'
+    xochitl_dir.mkdir()
+    write_document(xochitl_dir, '00000000-0000-0000-0000-000000000201', 'Notebook',
+                   ['n1', 'n2', 'n3'], rm_pages=('n1', 'n3'))
+    write_document(xochitl_dir, '00000000-0000-0000-0000-000000000202', 'Annotated PDF',
+                   ['a1', 'a2'], rm_pages=('a2',), backing_pages=2)
+
+    outputs = []
+    for jobs in (1, 2):
+        output_dir = tmp_path / f'out-{jobs}'
+        rm_process.run_rm_process(xochitl_dir, output_dir, jobs=jobs)
+        outputs.append(output_dir)
+    serial, parallel = outputs
+
+    assert not (serial / 'errors.json').exists()
+    assert not (parallel / 'errors.json').exists()
+    metadata = json.loads((serial / 'metadata.json').read_text())
+    assert len(metadata) == 2
+    assert json.loads((parallel / 'metadata.json').read_text()) == metadata
+    for item in metadata:
+        with fitz.open(serial / item['output_pdf']) as a, fitz.open(parallel / item['output_pdf']) as b:
+            assert [page.get_text() for page in a] == [page.get_text() for page in b]
+            assert [len(page.get_drawings()) for page in a] == [len(page.get_drawings()) for page in b]
@@ -0,0 +1,44 @@
+from rm_viewer import rm_process
+from rm_viewer.rm_view import create_app
+
+from conftest import write_document
+
+DOC_IDS = [f'00000000-0000-0000-0000-00000000010{n}' for n in range(4)]
+
+
+def process(tmp_path, on_items_published=None):
+    xochitl_dir = tmp_path / 'xochitl'
+    xochitl_dir.mkdir()
+    for n, id in enumerate(DOC_IDS):
+        write_document(xochitl_dir, id, f'Notes {n}', ['p1'], backing_pages=1)
+    output_dir = tmp_path / 'out'
+    rm_process.run_rm_process(
+        xochitl_dir, output_dir, no_thumbnails=True, on_items_published=on_items_published
+    )
+    return output_dir
+
+
+def test_publishes_are_coalesced(tmp_path, remarks_calls):
+    published = []
+    process(tmp_path, published.append)
+
+    # Every item is announced exactly once, in fewer calls than items
+    assert sorted(id for ids in published for id in ids) == DOC_IDS
+    assert len(published) < len(DOC_IDS)
+
+
+def test_generation_lists_changed_ids(tmp_path, remarks_calls):
+    client = create_app(process(tmp_path)).test_client()
+
+    client.post('/api/rebuild', json={'ids': [DOC_IDS[1]]})
+    client.post('/api/rebuild', json={'ids': [DOC_IDS[2], DOC_IDS[1]]})
+    assert client.get('/api/generation?since=0').get_json() == {
+        'generation': 2, 'changed': [DOC_IDS[1], DOC_IDS[2]]
+    }
+    assert client.get('/api/generation?since=1').get_json()['changed'] == [DOC_IDS[1], DOC_IDS[2]]
+    assert client.get('/api/generation?since=2').get_json()['changed'] == []
+
+    # A full rebuild may have changed anything
+    client.post('/api/rebuild')
+    assert client.get('/api/generation?since=2').get_json()['changed'] is None
+    assert client.get('/api/generation').get_json() == {'generation': 3}
@@ -0,0 +1,45 @@
+import json
+
+import fitz
+
+from rm_viewer import rm_process
+from rm_viewer.ocr import OCRBudget, OCRImageOptions
+
+from conftest import gcv_word
+
+
+def write_pages(tmp_path, count: int) -> list[tuple]:
+    """Single-page PDFs in ocr_pages() job form."""
+    pages = []
+    for i in range(count):
+        pdf = tmp_path / f'page{i}.pdf'
+        doc = fitz.open()
+        doc.new_page(width=445, height=594).draw_line((50, 50), (300, 200))
+        doc.save(pdf)
+        pages.append((pdf, tmp_path / f'page{i}.ocr.json.gz', f'hash{i}', None))
+    return pages
+
+
+def test_failed_pages_are_refunded(tmp_path, gcv_server):
+    budget = OCRBudget(tmp_path / 'ocr_usage.json', max_pages_per_run=3, max_pages_per_day=3)
+    pages = write_pages(tmp_path, 3)
+    gcv_server.respond = lambda body: (200, {'responses': [
+        gcv_word() if i == 0 else {'error': {'message': 'bad image'}}
+        for i in range(len(body['requests']))
+    ]})
+
+    outcomes = rm_process.ocr_pages(pages, 'test-key', OCRImageOptions(grayscale=True), ocr_budget=budget)
+
+    assert outcomes == ['scanned', None, None]
+    usage = json.loads((tmp_path / 'ocr_usage.json').read_text())
+    assert usage['day_pages'] == 1
+    assert usage['runs'][budget.run_id]['pages'] == 1
+    # The two failed pages can be retried within the same budget
+    assert budget.reserve(3) == 2
+
+
+def test_release_never_goes_negative(tmp_path):
+    budget = OCRBudget(tmp_path / 'ocr_usage.json', max_pages_per_day=5)
+    assert budget.reserve(2) == 2
+    budget.release(4)
+    assert budget.reserve(10) == 5
@@ -0,0 +1,34 @@
+import fitz
+import pytest
+
+from rm_viewer.ocr import OCRImageOptions, render_ocr_image
+
+# reMarkable page size in points
+PAGE_WIDTH, PAGE_HEIGHT = 445.0, 594.0
+
+
+@pytest.fixture
+def written_page(tmp_path):
+    """A page with strokes from corner to corner, so cropping keeps all of it."""
+    path = tmp_path / 'page.pdf'
+    doc = fitz.open()
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.draw_line((5, 5), (PAGE_WIDTH - 5, PAGE_HEIGHT - 5))
+    doc.save(path)
+    return path
+
+
+def test_full_page_keeps_full_dpi(written_page):
+    _, dims = render_ocr_image(written_page, OCRImageOptions(crop_to_ink=False, grayscale=True))
+
+    assert dims['dpi'] == 600
+    assert dims['img_width_px'] == pytest.approx(PAGE_WIDTH / 72 * 600, abs=1)
+    assert dims['img_height_px'] == pytest.approx(PAGE_HEIGHT / 72 * 600, abs=1)
+
+
+def test_crop_fits_pixel_budget(written_page):
+    options = OCRImageOptions(grayscale=True)
+    _, dims = render_ocr_image(written_page, options)
+
+    assert options.min_dpi < dims['dpi'] < 600
+    assert dims['img_width_px'] * dims['img_height_px'] <= options.max_pixels * 1.01
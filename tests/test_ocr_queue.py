@@ -0,0 +1,36 @@
+import json
+
+from rm_viewer import rm_process
+
+from conftest import write_document, gcv_word
+
+DOC_ID = '3c9d7a52-0b8e-4f61-a1d2-6e4b5f7c8a90'
+
+
+def test_rename_during_ocr_keeps_results(tmp_path, remarks_calls, gcv_server, fake_chrome):
+    xochitl_dir = tmp_path / 'xochitl'
+    xochitl_dir.mkdir()
+    write_document(xochitl_dir, DOC_ID, 'Before', ['p1', 'p2'], rm_pages=('p1', 'p2'))
+    output_dir = tmp_path / 'out'
+    rm_process.run_rm_process(xochitl_dir, output_dir, no_thumbnails=True, defer_ocr=True)
+
+    def rename_then_respond(body):
+        # Metadata-only edit, processed while the request is in flight
+        metadata_file = xochitl_dir / f'{DOC_ID}.metadata'
+        metadata = json.loads(metadata_file.read_text())
+        metadata_file.write_text(json.dumps({**metadata, 'visibleName': 'After'}))
+        rm_process.run_rm_process(xochitl_dir, output_dir, no_thumbnails=True, defer_ocr=True)
+        return 200, {'responses': [gcv_word() for _ in body['requests']]}
+    gcv_server.respond = rename_then_respond
+
+    stats = rm_process.process_ocr_queue(output_dir, 'test-key')
+
+    assert stats['ocr_scans'] == 2
+    assert stats['pages_pending'] == 0
+    [item] = json.loads((output_dir / 'metadata.json').read_text())
+    assert item['name'] == 'After'
+    for rm_file in item['rm_files']:
+        assert not rm_file['ocr_pending']
+        assert rm_file['ocr_path'].startswith(f'After - {DOC_ID}/')
+        assert (output_dir / rm_file['ocr_path']).exists()
+    assert not list(output_dir.glob('.*.tmp'))
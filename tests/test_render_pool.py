@@ -0,0 +1,20 @@
+from rm_viewer import rm_process
+
+from conftest import write_document
+
+
+def test_pooled_run_leaves_no_chrome_profiles(tmp_path, capsys, remarks_calls, fake_chrome):
+    xochitl_dir = tmp_path / 'xochitl'
+    xochitl_dir.mkdir()
+    for n in range(3):
+        id = f'00000000-0000-0000-0000-00000000000{n}'
+        write_document(xochitl_dir, id, f'Notes {n}', ['p1', 'p2'], rm_pages=('p1', 'p2'))
+    output_dir = tmp_path / 'out'
+
+    rm_process.run_rm_process(xochitl_dir, output_dir, jobs=2, no_thumbnails=True)
+
+    assert not (output_dir / 'errors.json').exists()
+    # Pages went through the workers' render pools...
+    assert '6 pages printed by pooled Chrome' in capsys.readouterr().out
+    # ...which were shut down when the workers exited
+    assert not list(fake_chrome.glob('rm-viewer-chrome-*'))
@@ -0,0 +1,60 @@
+import math
+import random
+
+import fitz
+import pytest
+
+from rm_viewer.ocr import add_text_layer_to_page, compact_ocr_result, _iter_text_layer_words
+
+
+def make_ocr_result(n_words: int = 200, seed: int = 0) -> dict:
+    """An OCR result for a cropped page image with words at assorted angles."""
+    rnd = random.Random(seed)
+    annotations = []
+    for i in range(n_words):
+        x, y = rnd.randint(50, 3000), rnd.randint(50, 4000)
+        width, height = rnd.randint(60, 400), rnd.randint(40, 120)
+        angle = math.radians(rnd.choice([0, 0, 3, -8, 90, 180]))
+        cos, sin = math.cos(angle), math.sin(angle)
+        v0 = (x, y)
+        v1 = (x + width * cos, y + width * sin)
+        v3 = (x - height * sin, y + height * cos)
+        v2 = (v1[0] - height * sin, v1[1] + height * cos)
+        annotations.append({
+            'description': f'word{i}',
+            'boundingPoly': {'vertices': [{'x': round(px), 'y': round(py)} for px, py in (v0, v1, v2, v3)]}
+        })
+    return compact_ocr_result({
+        'pdf_width_pt': 445.0, 'pdf_height_pt': 594.0,
+        'img_width_px': 3200, 'img_height_px': 4300, 'dpi': 550,
+        'crop': [20.0, 30.0, 20.0 + 3200 * 72 / 550, 30.0 + 4300 * 72 / 550],
+        'gcv_response': {'responses': [{'textAnnotations': [{'description': 'all'}] + annotations}]}
+    })
+
+
+def test_batched_layout_matches_per_word_layout():
+    ocr_result = make_ocr_result()
+    # Output page at a different size to the OCR'd one
+    batched = list(_iter_text_layer_words(ocr_result, 612.0, 792.0, batched=True))
+    per_word = list(_iter_text_layer_words(ocr_result, 612.0, 792.0, batched=False))
+
+    assert len(batched) == len(per_word) == 200
+    for fast, slow in zip(batched, per_word):
+        assert fast[0] == slow[0]
+        assert fast[1:6] == pytest.approx(slow[1:6], abs=1e-6)
+        for fast_point, slow_point in zip(fast[6], slow[6]):
+            assert fast_point == pytest.approx(slow_point, abs=1e-6)
+
+
+def test_batched_text_layer_matches_per_word_text_layer():
+    ocr_result = make_ocr_result(n_words=50, seed=1)
+    texts = []
+    for batched in (True, False):
+        doc = fitz.open()
+        page = doc.new_page(width=445, height=594)
+        assert add_text_layer_to_page(page, ocr_result, 445, 594, batched=batched) == 50
+        texts.append(sorted(page.get_text('words'), key=lambda word: word[4]))
+
+    for fast, slow in zip(*texts):
+        assert fast[4] == slow[4]
+        assert fast[:4] == pytest.approx(slow[:4], abs=0.01)